@@ -52,7 +52,7 @@ while True:
     next_ship_id = max([ship.id for ship in me.get_ships()]) + 1 if len(me.get_ships()) > 0 else 1
 
     # Precompute potential targets (all cells, sorted in descending halite amount)
-    target_pos = util.PriorityQueue()
+    target_pos = util.BucketPriorityQueue() # priorities are (negated) integer halite amounts
     for x in range(game_map.width):
         for y in range(game_map.height):
             pos = Position(x, y)
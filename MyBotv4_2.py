@@ -3,16 +3,21 @@
 # Import the Halite SDK, which will let you interact with the game.
 import hlt
 from hlt import constants
+from hlt import assignment
+from hlt import collision
 from hlt import positionals
+from hlt import targeting
 from hlt import util
-from hlt.positionals import Direction, Position
+from hlt.positionals import Direction
 
 import csv
+import os
 import random
 import logging
 
 # This game object contains the initial game state.
-game = hlt.Game()
+game = hlt.Game(threat_map=True, # where enemy ships could be next turn (see GameMap.update_threats)
+                profile='HALITE_PROFILE' in os.environ) # per-phase turn times (see hlt/timing.py)
 
 # SETUP
 
@@ -29,9 +34,13 @@ spawned_ships = 0
 ship_targets = {} # maps ship IDs to their target destinations.
 ship_blockers = {} # maps ship IDs to ship ID(s) that are blocking them.
 ship_stats = {} # maps ship IDs to ShipStats object (see above)
+target_assigner = assignment.AuctionAssigner() # assigns retargeted ships to targets, warm-started from last turn
 RECALL_MODE = False # whether to force ships to return to base and allow friendly ship collisions on shipyard/dropoffs
 max_breakeven_age = 3 # longest time for a ship to breakeven (helps determine when to stop spawning)
 min_num_ships = 5
+# build what the first turn would otherwise have to (see Game.add_startup_task)
+game.add_startup_task("target candidates", lambda game: game.game_map.get_target_candidates())
+game.add_startup_task("halite sums layout", lambda game: game.game_map.get_halite_sums(exclude_occupied=True, max_radius=2))
 # end SETUP, start game
 
 game.ready("ModularTargetingSwarm_v3")
@@ -46,22 +55,36 @@ while True:
     if RECALL_MODE:
         logging.info("RECALLING ALL SHIPS")
     # TODO why doesn't this efficiency match the replay's efficiency stat?
-    logging.info("Efficiency = {}".format(efficiency))
-    logging.info("Ships alive / spawned = {} / {}".format(len(me.get_ships()), spawned_ships))
+    logging.info("Efficiency = %s", efficiency)
+    logging.info("Ships alive / spawned = %d / %d", len(me.get_ships()), spawned_ships)
     halite_to_spend = me.halite_amount
 
     # list of valid dropoff locations (includes dropoffs and the shipyard)
     my_dropoffs = me.get_dropoffs()
     my_dropoffs.append(me.shipyard)
 
+    # cheapest route home (halite burned and number of moves) from every cell
+    return_field = game_map.get_return_field(me.id)
+
+    # closest dropoff of every ship, computed for all ships at once
+    closest_drops = {} # maps ship IDs to (index into my_dropoffs, distance to that dropoff)
+    ship_drop_idx, ship_drop_dist = game_map.get_closest_batch(me.get_ships(), my_dropoffs)
+    for ship, drop_idx, drop_dist in zip(me.get_ships(), ship_drop_idx.tolist(), ship_drop_dist.tolist()):
+        closest_drops[ship.id] = (drop_idx, drop_dist)
+
     next_ship_id = max([ship.id for ship in me.get_ships()]) + 1 if len(me.get_ships()) > 0 else 1
 
+    game.profiler.split("setup")
     # 1. Spawn decision (based on turn #, total # of turns, efficiency, "crowdedness" of shipyard and surrounding squares)
-    for ship in me.get_ships():
-        if ship.id not in ship_targets:
-            ship_targets[ship.id] = me.shipyard.position
-        if ship.id not in ship_stats:
-            ship_stats[ship.id] = ShipStats(game.turn_number - 1, 0, 0, 0)
+    # forget destroyed ships and start tracking newly spawned ones
+    for ship_id in me.destroyed:
+        ship_targets.pop(ship_id, None)
+        ship_stats.pop(ship_id, None)
+    target_assigner.forget(me.destroyed)
+    game.encoder.forget(me.destroyed)
+    for ship_id in me.spawned:
+        ship_targets[ship_id] = me.shipyard.position
+        ship_stats[ship_id] = ShipStats(game.turn_number - 1, 0, 0, 0)
 
     end_game_duration = max_breakeven_age * 1.1 # extra moves because board is emptier
     shipyard_escape_sq = 0
@@ -78,30 +101,26 @@ while True:
             spawned_ships += 1
             halite_to_spend -= constants.SHIP_COST
 
+    game.profiler.split("spawn")
     # 2. Reassign ship targets (could be a halite-dense region, a shipyard, a dropoff, etc.)
     # Which ships should be retargeted (aren't returning to base or being recalled)
     # TODO way to not give multiple commands to ship (e.g. dropoff vs. move)
     retarget_ships = [] # list of ships to retarget
+    open_halite_sums = game_map.get_halite_sums(exclude_occupied=True, max_radius=2)
     for ship in me.get_ships():
-        # logging.info("Ship {}: age={}, delivered={}".format(
+        # logging.info("Ship %d: age=%d, delivered=%d",
         #     ship.id, game.turn_number - ship_stats[ship.id].turn_of_birth,
-        #     ship_stats[ship.id].halite_delivered))
+        #     ship_stats[ship.id].halite_delivered)
 
-        closest_drop_id, closest_drop_pos = game_map.get_closest(ship.position, my_dropoffs)
-        dist_to_dropoff = game_map.calculate_distance(ship.position, closest_drop_pos)
+        closest_drop_idx, dist_to_dropoff = closest_drops[ship.id]
+        closest_drop_pos = my_dropoffs[closest_drop_idx].position
 
         # TODO If enough halite on this square (e.g. collision), build a dropoff on it to secure it
         # TODO If there's enough halite in the nearby area and we're far from nearest dropoff, build a dropoff
         # also account for late game (dropoffs are less good) and number of nearby friendly/enemy ships
 
-        total_nearby = 0
-        open_nearby = 0
-        nearby_positions = ship.position.get_within_radius(2)
-        for pos in nearby_positions:
-            if pos != ship.position and not game_map[pos].is_occupied:
-                total_nearby += game_map[pos].halite_amount
-                open_nearby += 1
-        avg_nearby = total_nearby / max(open_nearby, 1)
+        # mean halite of the unoccupied cells within radius 2 (the ship's own cell is occupied)
+        avg_nearby = open_halite_sums.mean(game_map[ship].index, 2)
         # Parameters:
         # only stay on targets with at least this much halite
         target_halite_threshold = min(constants.MAX_HALITE * 0.1, avg_nearby)
@@ -110,7 +129,7 @@ while True:
         ### dynamic return threshold: based on distance from shipyard, nearby halite, number of ships, game turn number, etc.
         # TODO increase return threshold at early game, especia,ly when nearby avg is high
         force_return_threshold = constants.MAX_HALITE * min(0.9, 0.2 + game.turn_number / 200.0)
-        logging.info("return threshold = {}".format(force_return_threshold))
+        logging.info("return threshold = %s", force_return_threshold)
 
         if RECALL_MODE or ship.halite_amount >= force_return_threshold:
             # retarget to nearest dropoff or shipyard
@@ -125,61 +144,64 @@ while True:
             if game_map.at_dropoff(ship.position, me.id) or game_map[ship.position].halite_amount < target_halite_threshold:
                 retarget_ships.append(ship)
 
-        return_dist = game_map.calculate_distance(ship.position, closest_drop_pos)
+        # recall timing uses the shortest way home; the return field's cheapest route can be much longer
+        return_dist = dist_to_dropoff
         if constants.MAX_TURNS - game.turn_number <= return_dist:
             # logging.info(
-            #     "RECALL_MODE activated by ship {} distance {}"
-            #     "from shipyard with {} turns left".format(
-            #         ship.id, return_dist, constants.MAX_TURNS - game.turn_number))
+            #     "RECALL_MODE activated by ship %d distance %d "
+            #     "from shipyard with %d turns left",
+            #     ship.id, return_dist, constants.MAX_TURNS - game.turn_number)
             RECALL_MODE = True
 
     # Per ship, reassign its target based on halite amount and distance
     if not RECALL_MODE:
         # Precompute potential targets (all cells with more than average of neighbors, sorted in descending halite amount)
 
-        cells = []
-        for x in range(constants.WIDTH):
-            for y in range(constants.HEIGHT):
-                pos = Position(x, y)
-                nearby_amt = 0
-                for nbr_pos in pos.get_surrounding_cardinals():
-                    nearby_amt += game_map[nbr_pos].halite_amount
-                avg_nearby = nearby_amt / 4.0
-                if game_map[pos].halite_amount > avg_nearby:
-                    cells.append(game_map[pos])
-
-                #### TODO FIRST: large target squares (e.g. after collision) should "take" nearby ship's targets
-                #### (multiple ships, if needed)
-
-        # logging.info("{} possible targets".format(len(cells)))
+        candidate_cells = game_map.get_target_candidates().indices()
+
+        #### TODO FIRST: large target squares (e.g. after collision) should "take" nearby ship's targets
+        #### (multiple ships, if needed)
+
+        # logging.info("%d possible targets", len(candidate_cells))
         delay_factor = 1.2 # how often will ship have to stop to refuel or to avoid collision?
-        for ship in retarget_ships:
-            closest_drop_id, closest_drop_pos = game_map.get_closest(ship.position, my_dropoffs)
-            def cell_weight_func(cell):
-                time_to_target = delay_factor * game_map.calculate_distance(ship.position, cell.position)
-                time_to_return = delay_factor * game_map.calculate_distance(cell.position, closest_drop_pos)
-                return cell.halite_amount / max(1.0, time_to_target + time_to_return)
-            decorated_cells = []
-            for cell in cells:
-                decorated_cells.append((cell_weight_func(cell), cell))
-            target_cells = sorted(decorated_cells, key=lambda pair: pair[0], reverse=True)
-            for target_idx in range(len(target_cells)):
-                weight, cell = target_cells[target_idx]
-                best_target_position = cell.position
-                if best_target_position not in ship_targets.values():
-                    # logging.info("{} targeting {} weight={}".format(ship, cell, cell_weight_func(cell)))
-                    ship_targets[ship.id] = best_target_position
-                    break
+        # weight = halite / (time to reach the cell + time to return from it to the ship's closest dropoff)
+        # Targets are handed out by a global max-weight assignment rather than greedily in ship order
+        # (targets of the ships being retargeted stay available, so the assigner can keep them where still best)
+        retarget_ids = {ship.id for ship in retarget_ships}
+        free_cells = targeting.unclaimed(game_map, candidate_cells,
+                                         [target for ship_id, target in ship_targets.items() if ship_id not in retarget_ids])
+        cell_weights = targeting.score_targets(game_map, retarget_ships, free_cells, my_dropoffs, delay_factor)
+        best_targets = target_assigner.assign([ship.id for ship in retarget_ships], free_cells, cell_weights,
+                                              deadline=game.deadline)
+        logging.debug("%d of %d retargeted ships kept their target", target_assigner.reused, len(retarget_ships))
+        for ship_id, cell_index in best_targets.items():
+            # logging.info("ship %d targeting %s", ship_id, game_map[cell_index].position)
+            ship_targets[ship_id] = game_map[cell_index].position
 
     # Override: if enemy ship is on my shipyard/dropoff, ignore it for collision purposes
     for my_drop in my_dropoffs:
         if game_map[my_drop.position].is_occupied and game_map[my_drop.position].ship.owner != me.id:
             game_map[my_drop.position].ship = None
 
+    game.profiler.split("retarget")
     # 3. Movement behavior (execute movement towards target, maybe with certain amount of randomness or "impatience")
-    planned_moves = {}
+    # Each ship ranks the moves it would like to make; collision.resolve_moves then picks
+    # one move per ship for the whole fleet (chains, swaps and cycles of friendly ships included)
+    if RECALL_MODE:
+        # Routes home are planned a few turns ahead around each other's reservations;
+        # only ships that strayed from their plan (or have none) plan again
+        reservations = game_map.get_reservations()
+        drop_positions = [my_drop.position for my_drop in my_dropoffs]
+        for ship in reservations.repair(me.get_ships()):
+            reservations.plan(ship, my_dropoffs[closest_drops[ship.id][0]].position, shared=drop_positions)
+
+    def enemy_at(pos):
+        return game_map[pos].is_occupied and game_map[pos].ship.owner != me.id
+
+    threats = game_map.get_threat_map(me.id) # where enemy ships could be next turn
+    move_prefs = {} # maps ship IDs to their preferred directions, best first
     for ship in me.get_ships():
-        closest_drop_id, closest_drop_pos = game_map.get_closest(ship.position, my_dropoffs)
+        closest_drop_pos = my_dropoffs[closest_drops[ship.id][0]].position
         if RECALL_MODE:
             ship_targets[ship.id] = closest_drop_pos
             for my_drop in my_dropoffs:
@@ -189,34 +211,42 @@ while True:
         cost_to_move = game_map.get_move_cost(ship)
         gain_of_stay = game_map.get_collect_amt(ship)
 
-        logging.info("Ship {} at {}, target={}".format(ship.id, ship.position, ship_target))
+        logging.info("Ship %d at %s, target=%s", ship.id, ship.position, ship_target)
 
-        move_dir = Direction.Still
-        tried_to_move = False
         if ship.halite_amount < cost_to_move or ship_target == ship.position:
-            move_dir = Direction.Still # forced to take this action
-            tried_to_move = False
+            prefs = [Direction.Still] # forced to take this action
         elif RECALL_MODE:
-            # ship doesn't have time or capacity to collect
-            move_dir = game_map.random_naive_navigate(ship, ship_target)
-            tried_to_move = True
+            # ship doesn't have time or capacity to collect: follow its planned route
+            # (which may wait a turn), otherwise any move towards the target
+            prefs = game_map.get_unsafe_moves(ship.position, ship_target)
+            random.shuffle(prefs)
+            prefs.insert(0, reservations.next_direction(ship))
         else:
-            need_to_evade = True
-            # Try to make progress towards target without direct collision or
-            # even risking collision with enemy (don't mark unsafe yet)
+            # Moves that make progress towards target without direct collision with an enemy,
+            # split by whether they risk a collision with an enemy next turn
             fast_dirs = game_map.get_unsafe_moves(ship.position, ship_target)
+            if game_map.at_dropoff(ship_target, me.id):
+                # returning ships try the first move of the cheapest route home first
+                fast_dirs.insert(0, return_field.get_next_direction(ship.position))
+            safe_dirs, risky_dirs = [], []
             for fast_dir in fast_dirs:
                 new_pos = ship.position.directional_offset(fast_dir)
-                if not game_map[new_pos].is_occupied:
-                    move_dir = fast_dir
-                    tried_to_move = True
-                    if not game_map.opponent_adjacent(new_pos, me.id):
-                        need_to_evade = False
-                        break
-            if move_dir == Direction.Still and not game_map.opponent_adjacent(ship.position, me.id):
-                need_to_evade = False
-                tried_to_move = False
-            # logging.info("ship {} plans to move {}, need evade? {}".format(ship.id, Direction.convert(move_dir), need_to_evade))
+                if fast_dir != Direction.Still and not enemy_at(new_pos):
+                    if game_map.opponent_adjacent(new_pos, me.id):
+                        risky_dirs.append(fast_dir)
+                    else:
+                        safe_dirs.append(fast_dir)
+            # among risky moves, prefer cells only enemies carrying more halite can reach
+            # (they have more to lose from a collision)
+            risky_dirs.sort(key=lambda dir: -threats.max_cargo_at(ship.position.directional_offset(dir)))
+            need_to_evade = not safe_dirs and (risky_dirs or game_map.opponent_adjacent(ship.position, me.id))
+
+            # Moves away from all enemy ships, in case the ship is blocked or evading
+            cardinal_dirs = Direction.get_all_cardinals()
+            random.shuffle(cardinal_dirs)
+            defensive_dirs = [dir for dir in cardinal_dirs
+                              if not enemy_at(ship.position.directional_offset(dir)) and
+                              not game_map.opponent_adjacent(ship.position.directional_offset(dir), me.id)]
 
             # Evasive movement (avoid enemy if possible, otherwise stay still) when returning to base
             # and otherwise probabilistically evade based on ship/ship's position halite
@@ -224,25 +254,13 @@ while True:
             if game_map.at_dropoff(ship_target, me.id):
                 evasiveness = 1.0
             else:
-                if move_dir == Direction.Still: # if planning to collect, how much left to collect here?
+                if not safe_dirs and not risky_dirs: # if planning to collect, how much left to collect here?
                     evasiveness = 1 - gain_of_stay / constants.MAX_HALITE
                 else: # if planning to move, what are we risking?
                     evasiveness = ship.halite_amount / constants.MAX_HALITE
 
             if need_to_evade and random.random() < evasiveness:
-                move_dir = Direction.Still
-                tried_to_move = True
-                cardinal_dirs = Direction.get_all_cardinals()
-                random.shuffle(cardinal_dirs)
-                for defensive_dir in cardinal_dirs:
-                    def_pos = ship.position.directional_offset(defensive_dir)
-                    if not game_map[def_pos].is_occupied and not game_map.opponent_adjacent(def_pos, me.id):
-                        move_dir = defensive_dir
-                        game_map.mark_unsafe_move(ship, move_dir)
-                        # logging.info("ship {} evading to {}!".format(ship.id, def_pos))
-                        break
-                # if move_dir == Direction.Still:
-                #     logging.info("ship {} evading but holding position {}!".format(ship.id, ship.position))
+                prefs = defensive_dirs
             else:
                 # ship can collect or move. Decide based on how much there is to be
                 # gained by reaching target
@@ -252,68 +270,30 @@ while True:
                     patience = gain_of_stay / max(10.0, game_map[ship_target].halite_amount * 0.25)
 
                 if random.random() < patience:
-                    move_dir = Direction.Still
-                    tried_to_move = False
+                    prefs = [Direction.Still]
                 else:
-                    # move_dir was set when checking whether you needed to evade
-                    # move_dir = game_map.random_naive_navigate(ship, ship_target)
-                    game_map.mark_unsafe_move(ship, move_dir)
-                    tried_to_move = True
+                    prefs = safe_dirs + risky_dirs
+                    # If blocked next to enemy ship(s), rather move somewhere safe from all enemy moves
+                    if game_map.opponent_adjacent(ship.position, me.id):
+                        prefs += [dir for dir in defensive_dirs if dir not in prefs]
 
-        planned_moves[ship.id] = (move_dir, tried_to_move)
+        move_prefs[ship.id] = prefs
 
-    # 4. Softlock detection/resolution
-    for ship in me.get_ships():
-        move_dir, tried_to_move = planned_moves[ship.id]
-        # Is the ship blocked or just collecting?
-        if tried_to_move and move_dir == Direction.Still:
-            original_dirs = game_map.get_unsafe_moves(ship.position, ship_targets[ship.id])
-            success = False # able to resolve the softlock?
-            for dir in original_dirs:
-                new_pos = ship.position.directional_offset(dir)
-                # logging.info("{} trying to move to {}".format(ship, new_pos))
-                other_ship = game_map[new_pos].ship
-                if other_ship is None:
-                    # no longer blocked
-                    planned_moves[ship.id] = dir, tried_to_move
-                    game_map.mark_unsafe_move(ship, dir)
-                    success = True
-                elif other_ship.owner == me.id and other_ship.id in planned_moves: # note: can't check with ship owner ID since the placeholder ship at spawn above is also "friendly"
-                    # Is the blocking ship friendly?
-                    # logging.info("other ship {}".format(other_ship))
-                    other_move_dir, other_tried_to_move = planned_moves[other_ship.id]
-                    if other_tried_to_move and other_move_dir == Direction.Still:
-                        other_dirs = game_map.get_unsafe_moves(other_ship.position, ship_targets[other_ship.id])
-                        for other_dir in other_dirs:
-                            other_new_pos = other_ship.position.directional_offset(other_dir)
-                            if other_new_pos == ship.position:
-                                # can swap ship positions!
-                                # logging.info("swapping ship positions: {} targets {} and {} targets {}".format(ship, ship_targets[ship.id], other_ship, ship_targets[other_ship.id]))
-                                planned_moves[ship.id] = dir, tried_to_move
-                                planned_moves[other_ship.id] = other_dir, other_tried_to_move
-                                game_map.mark_unsafe_move(ship, dir)
-                                game_map.mark_unsafe_move(other_ship, other_dir)
-                                success = True
-                                break
-
-                if success: break
-
-            # If blocked by enemy ship(s), try a different direction that is safe from all enemy moves
-            if game_map.opponent_adjacent(ship.position, me.id):
-                cardinal_dirs = Direction.get_all_cardinals()
-                random.shuffle(cardinal_dirs)
-                for dir in cardinal_dirs:
-                    nbr_pos = ship.position.directional_offset(dir)
-                    if not game_map[nbr_pos].is_occupied and not game_map.opponent_adjacent(nbr_pos, me.id):
-                        planned_moves[ship.id] = dir, tried_to_move
-                        game_map.mark_unsafe_move(ship, dir)
-                        break
+    game.profiler.split("move")
+    # 4. Collision resolution: ships carrying more halite win contested cells
+    shared_cells = [my_drop.position for my_drop in my_dropoffs] if RECALL_MODE else ()
+    planned_moves = collision.resolve_moves(game_map, me.get_ships(), move_prefs,
+                                            priority={ship.id: ship.halite_amount for ship in me.get_ships()},
+                                            shared=shared_cells)
+
+    # If the turn runs out of time from here on, at least send the planned moves
+    game.set_fallback(command_queue + [game.encoder.move(ship.id, planned_moves[ship.id]) for ship in me.get_ships()])
 
+    game.profiler.split("resolve")
     # 5. Send moves and update statistics
     for ship in me.get_ships():
-        move_dir, tried_to_move = planned_moves[ship.id]
-        game_map.mark_unsafe_move(ship, move_dir)
-        command_queue.append(ship.move(move_dir))
+        move_dir = planned_moves[ship.id]
+        command_queue.append(game.encoder.move(ship.id, move_dir))
 
         cost_to_move = game_map.get_move_cost(ship)
         gain_of_stay = game_map.get_collect_amt(ship)
@@ -328,13 +308,14 @@ while True:
             ship_stats[ship.id].halite_delivered += ship.halite_amount - cost_to_move
             total_halite_collected += ship.halite_amount - cost_to_move
             # if not RECALL_MODE:
-            #     logging.info("{} drops off {} this turn".format(ship, ship.halite_amount - cost_to_move))
+            #     logging.info("%s drops off %d this turn", ship, ship.halite_amount - cost_to_move)
 
             ship_age = game.turn_number - ship_stats[ship.id].turn_of_birth
             if not_yet_breakeven and ship_stats[ship.id].halite_delivered >= constants.SHIP_COST and ship_age > max_breakeven_age:
-                logging.info("longest breakeven age is now {} from ship {}".format(ship_age, ship.id))
+                logging.info("longest breakeven age is now %d from ship %d", ship_age, ship.id)
                 max_breakeven_age = ship_age
 
 
+    game.profiler.split("stats")
     # Send your moves back to the game environment, ending this turn.
     game.end_turn(command_queue)
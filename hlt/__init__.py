@@ -1,5 +1,11 @@
 #!/usr/bin/env python
 
+import time as _time
+_import_start = _time.perf_counter()
+
 from . import commands, entity, game_map, networking, constants
 from .networking import Game
 from .positionals import Direction, Position
+
+# Seconds importing the package took, reported by Game.ready
+import_time = _time.perf_counter() - _import_start
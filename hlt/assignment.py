@@ -0,0 +1,131 @@
+from collections import deque
+
+import numpy as np
+
+
+class AuctionAssigner:
+    """
+    Assigns ships to targets as a max-weight bipartite matching using
+    Bertsekas' forward auction algorithm.
+
+    Each ship may end up with at most one target and each target with at
+    most one ship; a ship stays unassigned when no target is worth its price.
+    The final assignment is within len(ships) * epsilon of the optimum.
+
+    The assigner keeps last turn's assignment and target prices. A ship whose
+    previous target is still a candidate and still (nearly) its best option at
+    current prices keeps it without bidding, so only ships whose situation
+    changed take part in the auction. Targets nobody holds start at price 0,
+    which keeps the warm-started result as good as a cold solve.
+    """
+    def __init__(self, epsilon_fraction=0.01):
+        """
+        :param epsilon_fraction: Epsilon as a fraction of the largest benefit, divided by the number of ships
+        """
+        self.epsilon_fraction = epsilon_fraction
+        self.assignment = {}  # ship id -> assigned target (cell index)
+        self.prices = {}      # assigned target (cell index) -> price
+        self.reused = 0       # how many ships the last assign call left on their previous target
+
+    def forget(self, ship_ids):
+        """
+        Drops the assignments of ships (e.g. ships that were destroyed).
+        :param ship_ids: The ids of the ships to drop
+        :return: nothing
+        """
+        for ship_id in ship_ids:
+            target = self.assignment.pop(ship_id, None)
+            self.prices.pop(target, None)
+
+    def assign(self, ship_ids, candidates, benefits, deadline=None):
+        """
+        Solves the assignment of ships to candidate targets.
+        :param ship_ids: The ids of the ships to assign (the rows of benefits)
+        :param candidates: Flat cell indices of the candidate targets (the columns of benefits)
+        :param benefits: Array of shape (len(ship_ids), len(candidates)), e.g. from targeting.score_targets
+        :param deadline: Optional timing.Deadline; once expired the auction stops and the
+            ships that still hold a target keep it (the rest stay unassigned)
+        :return: A dict from ship id to its assigned target's cell index (unassigned ships are left out)
+        """
+        ship_ids = list(ship_ids)
+        candidates = [int(candidate) for candidate in candidates]
+        num_ships, num_candidates = len(ship_ids), len(candidates)
+        if num_ships == 0 or num_candidates == 0:
+            self.forget(ship_ids)
+            self.reused = 0
+            return {}
+        benefits = np.asarray(benefits, dtype=np.float64)
+
+        # Warm start: ships keep last turn's target (and its price) if it is still a candidate
+        column = {candidate: j for j, candidate in enumerate(candidates)}
+        prices = np.zeros(num_candidates)
+        owner = np.full(num_candidates, -1, dtype=np.intp)
+        assigned = np.full(num_ships, -1, dtype=np.intp)
+        for i, ship_id in enumerate(ship_ids):
+            j = column.get(self.assignment.get(ship_id))
+            if j is not None and owner[j] == -1:
+                owner[j] = i
+                assigned[i] = j
+                prices[j] = self.prices.get(candidates[j], 0.0)
+        warm_started = assigned.copy()
+
+        epsilon = max(benefits.max(), 1e-9) * self.epsilon_fraction / num_ships
+        self._auction(benefits, prices, owner, assigned, epsilon, deadline)
+        self.reused = int(((assigned == warm_started) & (assigned != -1)).sum())
+
+        self.forget(ship_ids)
+        result = {}
+        for i, j in enumerate(assigned.tolist()):
+            if j != -1:
+                result[ship_ids[i]] = candidates[j]
+                self.assignment[ship_ids[i]] = candidates[j]
+                self.prices[candidates[j]] = float(prices[j])
+        return result
+
+    @staticmethod
+    def _auction(benefits, prices, owner, assigned, epsilon, deadline):
+        """Runs the auction in place until every ship is assigned or priced out (or time runs out)"""
+        unassigned = deque(i for i in range(len(assigned)) if assigned[i] == -1)
+        # Ships that no longer satisfy epsilon-complementary slackness have to bid
+        # again; the target they give up goes back to price 0 like every other free
+        # target, which can in turn unsettle other ships
+        released = True
+        while released:
+            released = False
+            for i in range(len(assigned)):
+                j = assigned[i]
+                if j == -1:
+                    continue
+                values = benefits[i] - prices
+                if values[j] < max(values.max(), 0.0) - epsilon:
+                    owner[j] = -1
+                    assigned[i] = -1
+                    prices[j] = 0.0
+                    unassigned.append(i)
+                    released = True
+
+        bids = 0
+        while unassigned:
+            bids += 1
+            if deadline is not None and bids % deadline.CHECK_INTERVAL == 0 and deadline.expired():
+                return
+            i = unassigned.popleft()
+            values = benefits[i] - prices
+            if len(values) > 1:
+                second, best = np.argpartition(values, -2)[-2:]
+                if values[second] > values[best]:
+                    best, second = second, best
+                second_value = max(values[second], 0.0)
+            else:
+                best = 0
+                second_value = 0.0
+            if values[best] <= 0.0:
+                # Not worth any target at current prices: stay unassigned
+                continue
+            prices[best] += values[best] - second_value + epsilon
+            previous = owner[best]
+            owner[best] = i
+            assigned[i] = best
+            if previous != -1:
+                assigned[previous] = -1
+                unassigned.append(previous)
@@ -0,0 +1,103 @@
+from collections import deque
+
+from .positionals import Direction, DIRECTIONS, _DIRECTION_SLOTS
+
+
+def resolve_moves(game_map, ships, preferences, priority=None, shared=()):
+    """
+    Picks one move per ship for the whole fleet at once so that no two
+    friendly ships end the turn on the same cell.
+
+    Every ship ranks the directions it would like to take, and staying still
+    is always its last resort. Moves are chosen as a max-weight matching of
+    ships to cells: a ship's options are worth more the higher it ranked them,
+    scaled up by its priority, and staying still is worth nothing. Because the
+    matching is over destination cells only, a ship may take a cell that
+    another ship is leaving, so chains, swaps and longer rotation cycles of
+    friendly ships come out of the matching without any ordering between the
+    ships. It is solved with a forward auction over the (at most five) options
+    of each ship, which takes a few bids per ship in practice.
+
+    Cells held by ships not being resolved (e.g. enemy ships, or a spawn
+    placeholder from MapCell.mark_unsafe) are never moved onto. On return the
+    map is updated as if every ship had made its move (see GameMap.move_ship).
+    :param game_map: The game map
+    :param ships: The ships to move
+    :param preferences: A dict from ship id to the list of Directions the ship
+        would like to take, best first (anything after Direction.Still is ignored)
+    :param priority: Optional dict from ship id to a number; ships with higher
+        priority are more likely to win contested cells
+    :param shared: Locations any number of ships may move onto (e.g. dropoffs when recalling)
+    :return: A dict from ship id to the Direction it should take
+    """
+    ships = list(ships)
+    num_ships = len(ships)
+    neighbor_indices = game_map.positions.neighbor_indices
+    shared = {game_map[location].index for location in shared}
+    own_ids = {ship.id for ship in ships}
+    owner = ships[0].owner if ships else None
+    blocked = {index for index, ship in game_map.ships_by_index().items()
+               if ship.owner != owner or ship.id not in own_ids}
+
+    # Integer weights: option rank dominates, priority (as a rank among ships) breaks contests
+    if priority is not None:
+        order = sorted(range(num_ships), key=lambda i: priority.get(ships[i].id, 0))
+    else:
+        order = range(num_ships - 1, -1, -1)
+    scale = [0] * num_ships
+    for rank, i in enumerate(order):
+        scale[i] = num_ships + rank
+
+    homes = [game_map[ship].index for ship in ships]
+    still = _DIRECTION_SLOTS[Direction.Still]
+    options = []  # per ship, (cell index, direction slot, benefit) options, ending with staying still
+    for i, (ship, home) in enumerate(zip(ships, homes)):
+        ship_options = []
+        seen = set()
+        for direction in preferences.get(ship.id, ()):
+            if direction == Direction.Still:
+                break
+            slot = _DIRECTION_SLOTS[direction]
+            cell = neighbor_indices[home][slot]
+            if cell in seen or (cell in blocked and cell not in shared):
+                continue
+            seen.add(cell)
+            ship_options.append((cell, slot))
+        options.append([(cell, slot, (len(ship_options) - rank) * scale[i])
+                        for rank, (cell, slot) in enumerate(ship_options)] + [(home, still, 0)])
+
+    # Forward auction: unassigned ships bid for their best cell at current prices. Staying
+    # home is always possible, so every ship ends up with a cell; epsilon below 1 / num_ships
+    # makes the result an optimal matching for integer weights.
+    epsilon = 1.0 / (num_ships + 1)
+    price = {}
+    holder = {}                 # cell index -> ship (position in ships) currently holding it
+    chosen = [still] * num_ships
+    bidding = deque(range(num_ships))
+    while bidding:
+        i = bidding.popleft()
+        best = None
+        best_value = second_value = float('-inf')
+        for cell, slot, benefit in options[i]:
+            value = benefit if cell in shared else benefit - price.get(cell, 0.0)
+            if value > best_value:
+                best, best_value, second_value = (cell, slot), value, best_value
+            elif value > second_value:
+                second_value = value
+        cell, slot = best
+        chosen[i] = slot
+        if cell in shared:
+            continue
+        if second_value == float('-inf'):
+            second_value = best_value - 2 * num_ships * 5
+        price[cell] = price.get(cell, 0.0) + best_value - second_value + epsilon
+        previous = holder.get(cell)
+        holder[cell] = i
+        if previous is not None:
+            bidding.append(previous)
+
+    moves = {}
+    for ship, home, slot in zip(ships, homes, chosen):
+        game_map.move_ship(ship, home, neighbor_indices[home][slot])
+        moves[ship.id] = DIRECTIONS[slot]
+    return moves
@@ -1,3 +1,89 @@
+import atexit
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+
+# Environment variable read by setup_logging for the log level (e.g. INFO, WARNING or OFF)
+LOG_LEVEL_ENV = "HALITE_LOG_LEVEL"
+
+_listener = None  # background thread writing queued log records (see setup_logging)
+_stream = None    # compressed log file, which logging.shutdown leaves open (see setup_logging)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The record's
+    arguments are formatted there, a moment later, so they should be values
+    that don't change in the meantime (numbers, strings, positions).
+    """
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(filename, level=None, use_queue=True, max_bytes=None, compress=False):
+    """
+    Sets up the root logger to write to a file.
+    :param filename: The log file's name (".gz" is appended if compressed)
+    :param level: A level name or number; defaults to the LOG_LEVEL_ENV environment
+        variable, else DEBUG. "OFF" disables logging entirely, so log calls return
+        right away and no file is created.
+    :param use_queue: Whether log calls only enqueue their records, leaving formatting
+        and writing to a background thread (see logging.handlers.QueueListener)
+    :param max_bytes: If given, the file rolls over once this large, keeping one backup
+    :param compress: Whether to write a gzip-compressed file
+    :return: nothing
+    """
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV) or "DEBUG"
+    if isinstance(level, str):
+        if level.upper() in ("OFF", "NONE"):
+            logging.disable(logging.CRITICAL)
+            return
+        level = logging.getLevelName(level.upper())
+
+    if compress:
+        import gzip
+        global _stream
+        _stream = gzip.open(filename + ".gz", "wt")
+        handler = logging.StreamHandler(_stream)
+    elif max_bytes is not None:
+        handler = logging.handlers.RotatingFileHandler(filename, mode="w", maxBytes=max_bytes, backupCount=1)
+    else:
+        handler = logging.FileHandler(filename, mode="w")
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    if use_queue:
+        global _listener
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        root.addHandler(_LazyQueueHandler(records))
+    else:
+        root.addHandler(handler)
+    if use_queue or compress:
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Writes out any queued log records, then flushes and closes all log handlers and the compressed log file"""
+    global _listener, _stream
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    logging.shutdown()
+    if _stream is not None:
+        _stream.close()
+        _stream = None
+
+
 # Placed here to avoid circular imports
 def read_input():
     """
@@ -7,5 +93,112 @@ def read_input():
     try:
         return input()
     except EOFError as eof:
-        logging.shutdown()
+        shutdown_logging()
         raise SystemExit(eof)
+
+
+class FrameReader:
+    """
+    Reads whole turn frames from the engine in bulk.
+
+    Instead of one input() call per line, raw bytes are pulled from
+    sys.stdin.buffer in large chunks and every integer in the frame is parsed
+    in a single pass into a flat list, which Player._update, Ship._generate,
+    Entity._generate and GameMap._update then consume by offset.
+
+    The input is read on a background thread that stamps every chunk with the
+    time it was read, as soon as it arrives. This way a frame's arrival_time
+    is when the engine sent it, even if the bot only gets to read it later
+    (e.g. after running over time on the previous turn).
+
+    Only use this once the line-based start-up input has been fully read
+    (i.e. after the bot has sent its name), so no input is left buffered in
+    sys.stdin's text layer. Game.ready starts the background thread right after
+    sending the bot's name (see start).
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, stream=None):
+        self._stream = stream if stream is not None else sys.stdin.buffer
+        self._chunks = queue.SimpleQueue()  # (time read, bytes) from the reader thread; b'' at end of input
+        self._reader = None
+        self._tokens = []     # parsed integers not yet handed out
+        self._token_times = collections.deque()  # [count, arrival time] runs covering _tokens, in order
+        self._partial = b''   # trailing bytes of an incomplete line
+        self._partial_time = None  # when the first byte of _partial arrived
+        self.arrival_time = None  # time.perf_counter() when the last frame started arriving
+
+    def start(self):
+        """Starts reading input in the background, unless already started"""
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_chunks, name="FrameReader", daemon=True)
+            self._reader.start()
+
+    def _read_chunks(self):
+        """Reader thread: hands input chunks to _fill along with when they were read"""
+        try:
+            while True:
+                chunk = self._stream.read1(self.CHUNK_SIZE)
+                self._chunks.put((time.perf_counter(), chunk))
+                if not chunk:
+                    return
+        finally:
+            self._chunks.put((time.perf_counter(), b''))
+
+    def _fill(self):
+        """Takes the next chunk of input and parses all of its complete lines"""
+        self.start()
+        arrival_time, chunk = self._chunks.get()
+        if not chunk:
+            shutdown_logging()
+            raise SystemExit(EOFError())
+        if not self._partial:
+            self._partial_time = arrival_time
+        data = self._partial + chunk
+        end = data.rfind(b'\n') + 1
+        if end > 0:
+            # The complete lines started arriving with the partial line left over from before
+            tokens = data[:end].split()
+            if tokens:
+                self._tokens.extend(map(int, tokens))
+                self._token_times.append([len(tokens), self._partial_time])
+            self._partial_time = arrival_time
+        self._partial = data[end:]
+
+    def _require(self, count):
+        """Blocks until at least count integers are available"""
+        while len(self._tokens) < count:
+            self._fill()
+
+    def read_frame(self, num_players):
+        """
+        Reads one turn frame: the turn number, then for each player its header
+        (id, ship count, dropoff count, halite), ships (id, x, y, halite) and
+        dropoffs (id, x, y), then the changed cell count and cells (x, y, halite).
+        Also records when the frame started arriving in arrival_time.
+        :param num_players: The number of players in the game
+        :return: The frame's integers as a flat list
+        """
+        self._require(1)
+        self.arrival_time = self._token_times[0][1]
+
+        end = 1
+        for _ in range(num_players):
+            self._require(end + 4)
+            num_ships, num_dropoffs = self._tokens[end + 1], self._tokens[end + 2]
+            end += 4 + 4 * num_ships + 3 * num_dropoffs
+        self._require(end + 1)
+        end += 1 + 3 * self._tokens[end]
+        self._require(end)
+
+        frame = self._tokens[:end]
+        del self._tokens[:end]
+        consumed = end
+        while consumed > 0:
+            run = self._token_times[0]
+            if run[0] > consumed:
+                run[0] -= consumed
+                break
+            consumed -= run[0]
+            self._token_times.popleft()
+        return frame
@@ -0,0 +1,89 @@
+import numpy as np
+
+from . import util
+
+
+def score_sites(game_map, player_id, radii=(3, 5, 8), radius_weights=(0.5, 0.3, 0.2),
+                min_friendly_distance=8, enemy_radius=8, ship_weight=0.5):
+    """
+    Scores every cell on the board as a site for a new dropoff in one vectorized pass:
+        density * spacing * safety * (1 + ship_weight * ships)
+    where
+        density: weighted mean halite per cell within each of the radii
+        spacing: distance to the closest friendly structure / min_friendly_distance, capped at 1
+        safety: distance to the closest enemy structure / enemy_radius, capped at 1
+        ships: friendly ships within the largest radius, per friendly ship on the map
+    Cells that already hold a structure score 0.
+    :param game_map: The game map
+    :param player_id: The player building the dropoff
+    :param radii: Manhattan radii to measure halite density at
+    :param radius_weights: Weight of each radius' mean halite
+    :param min_friendly_distance: Distance from friendly structures below which sites are penalized
+    :param enemy_radius: Distance from enemy structures below which sites are penalized
+    :param ship_weight: How much nearby friendly ships (which deliver sooner) add to a site's score
+    :return: A flat float array with one score per cell
+    """
+    size = game_map.width * game_map.height
+    sums = game_map.get_halite_sums(max_radius=max(radii))
+    density = np.zeros(size)
+    for radius, weight in zip(radii, radius_weights):
+        density += weight / (2 * radius * (radius + 1) + 1) * sums.grid(radius).reshape(-1)
+
+    score = density
+    for owned, scale in ((game_map.structure_owner == player_id, min_friendly_distance),
+                         ((game_map.structure_owner >= 0) & (game_map.structure_owner != player_id), enemy_radius)):
+        structures = owned.nonzero()[0]
+        if len(structures) > 0:
+            closest = game_map.distances(structures).min(axis=0)
+            score *= np.minimum(1.0, closest / scale)
+
+    my_ships = game_map.as_grid(game_map.ship_owner == player_id)
+    num_ships = int(my_ships.sum())
+    if num_ships > 0:
+        nearby_ships = util.diamond_sum(my_ships.astype(np.int16), max(radii)).reshape(-1)
+        score *= 1.0 + ship_weight * nearby_ships / num_ships
+
+    score[game_map.structure_owner >= 0] = 0.0
+    return score
+
+
+def top_sites(game_map, scores, k=5, min_separation=0):
+    """
+    Returns the k best-scoring sites, best first.
+    :param game_map: The game map
+    :param scores: Scores as returned by score_sites
+    :param k: How many sites to return
+    :param min_separation: Sites closer than this to a better site are skipped
+    :return: An array of (at most k) flat cell indices
+    """
+    if min_separation <= 0:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind='stable')]
+
+    sites = []
+    for index in np.argsort(-scores, kind='stable'):
+        if len(sites) == k or scores[index] <= 0:
+            break
+        if sites and game_map.distances([index], sites).min() < min_separation:
+            continue
+        sites.append(index)
+    return np.array(sites, dtype=np.intp)
+
+
+def best_ships(game_map, ships, sites):
+    """
+    Finds the ship best placed to build each site: the closest one, preferring
+    ships carrying more halite (which counts towards the dropoff's cost) among
+    equally close ones.
+    :param game_map: The game map
+    :param ships: The ships that could build a dropoff
+    :param sites: Flat cell indices of the sites
+    :return: A (best, distance) pair of arrays: ships[best[j]] is the ship best placed
+        to build sites[j], at distance distance[j]. Both are None if there are no ships.
+    """
+    if len(ships) == 0: return None, None
+    distances = game_map.distances(ships, sites)
+    cargo = np.array([ship.halite_amount for ship in ships])
+    best = (distances * (cargo.max() + 1) - cargo[:, None]).argmin(axis=0)
+    return best, distances[best, np.arange(len(best))]
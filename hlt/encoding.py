@@ -0,0 +1,91 @@
+from . import commands
+from .positionals import DIRECTIONS
+
+# Engine character of each direction code (index into positionals.DIRECTIONS)
+_DIRECTION_CHARS = (commands.NORTH, commands.SOUTH, commands.EAST, commands.WEST, commands.STAY_STILL)
+# Direction code of every way a direction can be given: Direction tuple, engine character or code
+_DIRECTION_CODES = {key: code for code, (direction, char) in enumerate(zip(DIRECTIONS, _DIRECTION_CHARS))
+                    for key in (direction, char, code)}
+
+
+class CommandEncoder:
+    """
+    Encodes commands to the bytes the engine reads.
+
+    Every ship's five move commands are encoded once, the first time the ship
+    moves, and reused from then on, so moving a ship is a lookup rather than a
+    string format. A turn's commands are assembled in one reusable buffer and
+    written out with a single write.
+
+    Directions can be given as Direction tuples, engine characters ('n', 's',
+    'e', 'w', 'o') or direction codes (indices into positionals.DIRECTIONS, as
+    used by the vectorized planners).
+    """
+    def __init__(self, capacity=1 << 14):
+        """
+        :param capacity: Initial size of the output buffer in bytes (it grows as needed)
+        """
+        self._moves = {}  # ship id -> its move commands as bytes, by direction code
+        self._buffer = bytearray(capacity)
+
+    def _ship_moves(self, ship_id):
+        moves = self._moves.get(ship_id)
+        if moves is None:
+            moves = self._moves[ship_id] = tuple(
+                "{} {} {}".format(commands.MOVE, ship_id, char).encode() for char in _DIRECTION_CHARS)
+        return moves
+
+    def move(self, ship_id, direction):
+        """
+        :param ship_id: The id of the ship to move
+        :param direction: The direction to move in
+        :return: The encoded move command
+        """
+        return self._ship_moves(ship_id)[_DIRECTION_CODES[direction]]
+
+    def moves(self, ship_ids, direction_codes):
+        """
+        Batch form of move for planners that produce arrays.
+        :param ship_ids: Sequence (e.g. numpy array) of ship ids
+        :param direction_codes: Sequence of direction codes, one per ship
+        :return: The list of encoded move commands
+        """
+        if hasattr(ship_ids, 'tolist'):
+            ship_ids = ship_ids.tolist()
+        if hasattr(direction_codes, 'tolist'):
+            direction_codes = direction_codes.tolist()
+        ship_moves = self._ship_moves
+        return [ship_moves(ship_id)[code] for ship_id, code in zip(ship_ids, direction_codes)]
+
+    def forget(self, ship_ids):
+        """
+        Drops the cached commands of ships (e.g. ships that were destroyed).
+        :param ship_ids: The ids of the ships to drop
+        :return: nothing
+        """
+        for ship_id in ship_ids:
+            self._moves.pop(ship_id, None)
+
+    def write(self, turn_commands, stream):
+        """
+        Writes a turn's commands to a binary stream as one space-separated line.
+        :param turn_commands: Commands as bytes (e.g. from move) or strings
+        :param stream: Where to write (e.g. sys.stdout.buffer); not flushed
+        :return: nothing
+        """
+        buffer = self._buffer
+        length = 0
+        for command in turn_commands:
+            if isinstance(command, str):
+                command = command.encode()
+            end = length + len(command)
+            while end >= len(buffer):
+                buffer.extend(bytes(len(buffer)))
+            buffer[length:end] = command
+            buffer[end] = 0x20  # space
+            length = end + 1
+        if length == 0:
+            length = 1
+        buffer[length - 1] = 0x0a  # newline
+        with memoryview(buffer) as view, view[:length] as line:
+            stream.write(line)
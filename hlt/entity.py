@@ -2,7 +2,6 @@ import abc
 
 from . import commands, constants
 from .positionals import Direction, Position
-from .common import read_input
 
 
 class Entity(abc.ABC):
@@ -15,13 +14,15 @@ class Entity(abc.ABC):
         self.position = position
 
     @staticmethod
-    def _generate(player_id):
+    def _generate(player_id, frame, offset):
         """
         Method which creates an entity for a specific player given input from the engine.
         :param player_id: The player id for the player who owns this entity
+        :param frame: The turn's integers as read by FrameReader
+        :param offset: Where this entity's (id, x, y) starts in the frame
         :return: An instance of Entity along with its id
         """
-        ship_id, x_position, y_position = map(int, read_input().split())
+        ship_id, x_position, y_position = frame[offset:offset + 3]
         return ship_id, Entity(player_id, ship_id, Position(x_position, y_position))
 
     def __repr__(self):
@@ -56,8 +57,6 @@ class Ship(Entity):
     """
     Ship class to house ship entities
     """
-    __ships = {}
-
     def __init__(self, owner, id, position, halite_amount):
         super().__init__(owner, id, position)
         self.halite_amount = halite_amount
@@ -88,28 +87,31 @@ class Ship(Entity):
         return "{} {} {}".format(commands.MOVE, self.id, commands.STAY_STILL)
 
     @staticmethod
-    def _generate(player_id):
+    def _generate(player_id, frame, offset):
         """
-        Creates an instance of a ship for a given player given the engine's input.
-        If an instance with the same ship.id has previously been generated, that instance will be returned.
+        Creates a new instance of a ship for a given player given the engine's input.
+        Ships that already exist are updated in place with Ship._update instead (see Player._update).
         :param player_id: The id of the player who owns this ship
+        :param frame: The turn's integers as read by FrameReader
+        :param offset: Where this ship's (id, x, y, halite) starts in the frame
         :return: The ship id and ship object
         """
-        # Read game engine input
-        ship_id, x_position, y_position, halite = map(int, read_input().split())
-
-        # Check storage to see if ship already exists
-        # If the ship exists, update its position and halite
-        if ship_id in Ship.__ships.keys():    
-            old_ship = Ship.__ships[ship_id]
-            old_ship.position = Position(x_position, y_position)
-            old_ship.halite_amount = halite
-            return ship_id, old_ship
-        else:
-            # Otherwise, create and return a new instance
-            new_ship = Ship(player_id, ship_id, Position(x_position, y_position), halite)
-            Ship.__ships[ship_id] = new_ship
-            return ship_id, new_ship
+        ship_id, x_position, y_position, halite = frame[offset:offset + 4]
+        return ship_id, Ship(player_id, ship_id, Position(x_position, y_position), halite)
+
+    def _update(self, frame, offset):
+        """
+        Updates this ship in place given the engine's input for the current turn.
+        :param frame: The turn's integers as read by FrameReader
+        :param offset: Where this ship's (id, x, y, halite) starts in the frame
+        :return: Whether the ship moved since last turn
+        """
+        self.halite_amount = frame[offset + 3]
+        x_position, y_position = frame[offset + 1], frame[offset + 2]
+        if x_position == self.position.x and y_position == self.position.y:
+            return False
+        self.position = Position(x_position, y_position)
+        return True
 
     def __repr__(self):
         return "{}(id={}, {}, cargo={} halite)".format(self.__class__.__name__,
@@ -1,22 +1,65 @@
 import math
 import random
-import queue
+import types
+
+import numpy as np
 
 from . import constants
 from . import util
 from .entity import Entity, Shipyard, Ship, Dropoff
+from .navigation import PathSearch, ReservationTable, ReturnField, ThreatMap
+from .targeting import CandidateIndex
 from .player import Player
-from .positionals import Direction, Position
+from .positionals import Direction, Position, PositionTable
 from .common import read_input
 
 
 class MapCell:
-    """A cell on the game map."""
-    def __init__(self, position, halite_amount):
-        self.position = position
-        self.halite_amount = halite_amount
-        self.ship = None
-        self.structure = None
+    """
+    A cell on the game map.
+
+    A thin view onto the owning GameMap's flat per-cell grids; views are
+    created lazily the first time a cell is indexed and reused afterwards.
+    """
+    __slots__ = ('_game_map', 'index', 'position')
+
+    def __init__(self, game_map, index):
+        self._game_map = game_map
+        self.index = index
+        self.position = game_map.positions.positions[index]
+
+    @property
+    def halite_amount(self):
+        """
+        :return: The amount of halite on this cell
+        """
+        return int(self._game_map.halite[self.index])
+
+    @halite_amount.setter
+    def halite_amount(self, halite_amount):
+        self._game_map.halite[self.index] = halite_amount
+
+    @property
+    def ship(self):
+        """
+        :return: The ship occupying (or marked as occupying) this cell, or None
+        """
+        return self._game_map._ships.get(self.index)
+
+    @ship.setter
+    def ship(self, ship):
+        self._game_map._set_ship(self.index, ship)
+
+    @property
+    def structure(self):
+        """
+        :return: The shipyard or dropoff on this cell, or None
+        """
+        return self._game_map._structures.get(self.index)
+
+    @structure.setter
+    def structure(self, structure):
+        self._game_map._set_structure(self.index, structure)
 
     @property
     def is_empty(self):
@@ -30,14 +73,14 @@ class MapCell:
         """
         :return: Whether this cell has any ships
         """
-        return self.ship is not None
+        return self.index in self._game_map._ships
 
     @property
     def has_structure(self):
         """
         :return: Whether this cell has any structures
         """
-        return self.structure is not None
+        return self.index in self._game_map._structures
 
     @property
     def structure_type(self):
@@ -68,26 +111,132 @@ class GameMap:
     """
     The game map.
 
-    Can be indexed by a position, or by a contained entity.
-    Coordinates start at 0. Coordinates are normalized for you
+    Can be indexed by a position, by a contained entity, or by a flat cell
+    index (y * width + x). Coordinates start at 0. Coordinates are normalized for you
+
+    Positions are interned per map size (see PositionTable in positionals.py),
+    available as game_map.positions along with the cell index helpers.
+
+    The board itself is stored as flat per-cell grids indexed by y * width + x:
+    halite, ship_owner, ship_id and structure_owner (-1 where a cell has no
+    ship or structure). These can be used directly for whole-board operations.
     """
-    def __init__(self, cells, width, height):
+    def __init__(self, halite, width, height):
         self.width = width
         self.height = height
-        self._cells = cells
+        self.positions = PositionTable.for_dimensions(width, height)
+        self.halite = np.array(halite, dtype=np.int32).reshape(width * height)
+        self.ship_owner = np.full(width * height, -1, dtype=np.int8)
+        self.ship_id = np.full(width * height, -1, dtype=np.int32)
+        self.structure_owner = np.full(width * height, -1, dtype=np.int8)
+        self._ships = {}                         # cell index -> ship on (or marked unsafe for) that cell; only
+                                                 # these cells are reset between turns
+        self._structures = {}                    # cell index -> shipyard or dropoff
+        self._cells = [None] * (width * height)  # lazily created MapCell views
+        self._inspired = {}                      # player id -> flat inspiration grid (see update_inspiration)
+        self._threats = {}                       # player id -> this turn's ThreatMap (see update_threats)
+        self._return_fields = {}                 # player id -> this turn's ReturnField
+        self._move_costs = {}                    # player id -> this turn's per-cell move costs
+        self._path_searches = {}                 # (player id, destination index) -> this turn's PathSearch
+        self._halite_sums = {}                   # (exclude_occupied, max_radius) -> this turn's util.DiamondSums
+        self._candidate_index = None             # kept up to date by _update once built
+        self._reservations = None                # persists across turns, advanced by _update once built
 
     def __getitem__(self, location):
         """
         Getter for position object or entity objects within the game map
-        :param location: the position or entity to access in this map
+        :param location: the position, entity or flat cell index to access in this map
         :return: the contents housing that cell or entity
         """
         if isinstance(location, Position):
-            location = self.normalize(location)
-            return self._cells[location.y][location.x]
+            index = (location.y % self.height) * self.width + location.x % self.width
         elif isinstance(location, Entity):
-            return self._cells[location.position.y][location.position.x]
-        return None
+            index = location.position.y * self.width + location.position.x
+        elif isinstance(location, (int, np.integer)):
+            index = int(location)
+        else:
+            return None
+        cell = self._cells[index]
+        if cell is None:
+            cell = self._cells[index] = MapCell(self, index)
+        return cell
+
+    def _set_ship(self, index, ship):
+        """Records the ship occupying a cell (or clears it if ship is None)"""
+        if ship is None:
+            self._ships.pop(index, None)
+            self.ship_owner[index] = -1
+            self.ship_id[index] = -1
+        else:
+            self._ships[index] = ship
+            self.ship_owner[index] = ship.owner
+            self.ship_id[index] = ship.id
+        for threats in self._threats.values():
+            threats._set_ship(index, ship)
+
+    def get_unsafe_indices(self):
+        """
+        :return: The flat indices of all cells currently occupied or marked unsafe
+        """
+        return list(self._ships)
+
+    def ships_by_index(self):
+        """
+        :return: A read-only, live mapping from the flat index of every cell occupied
+            or marked unsafe to the ship on it
+        """
+        return types.MappingProxyType(self._ships)
+
+    def occupant(self, index):
+        """
+        :param index: A flat cell index
+        :return: The ship occupying (or marked as occupying) the cell, or None
+        """
+        return self._ships.get(index)
+
+    def move_ship(self, ship, from_index, to_index):
+        """
+        Marks a ship's move on the map by flat cell indices: the ship now occupies
+        to_index, and from_index is cleared unless another ship has already been
+        marked there (see mark_unsafe_move), so the moves of several ships can be
+        marked one by one in any order. Threat maps are kept up to date.
+        :param ship: The moving ship
+        :param from_index: The cell the ship is leaving
+        :param to_index: The cell the ship moves to (from_index to stay still)
+        :return: nothing
+        """
+        occupant = self._ships.get(from_index)
+        if from_index != to_index and occupant is not None and occupant == ship:
+            self._set_ship(from_index, None)
+        self._set_ship(to_index, ship)
+
+    def _set_structure(self, index, structure):
+        """Records the structure on a cell (or clears it if structure is None)"""
+        if structure is None:
+            self._structures.pop(index, None)
+            self.structure_owner[index] = -1
+        else:
+            self._structures[index] = structure
+            self.structure_owner[index] = structure.owner
+
+    def as_grid(self, values):
+        """
+        Returns a (height, width) view of a flat per-cell array, e.g. as_grid(game_map.halite)
+        :param values: A flat array with one entry per cell
+        :return: The same data indexed as [y][x]
+        """
+        return values.reshape(self.height, self.width)
+
+    def neighbor_average(self):
+        """
+        Returns the mean halite amount of the four cardinal neighbors of every
+        cell, accounting for wrap-around.
+        :return: A flat float array with one entry per cell
+        """
+        grid = self.as_grid(self.halite)
+        total = np.roll(grid, 1, axis=0) + np.roll(grid, -1, axis=0) + \
+            np.roll(grid, 1, axis=1) + np.roll(grid, -1, axis=1)
+        return total.reshape(-1) / 4.0
 
     def calculate_distance(self, source, target):
         """
@@ -97,11 +246,46 @@ class GameMap:
         :param target: The target to where calculate
         :return: The distance between these items
         """
-        source = self.normalize(source)
-        target = self.normalize(target)
-        resulting_position = abs(source - target)
-        return min(resulting_position.x, self.width - resulting_position.x) + \
-            min(resulting_position.y, self.height - resulting_position.y)
+        return self.positions.x_wrap[(source.x - target.x) % self.width] + \
+            self.positions.y_wrap[(source.y - target.y) % self.height]
+
+    def location_indices(self, locations):
+        """
+        Converts locations to flat cell indices (y * width + x) in one go.
+        :param locations: A sequence of positions, entities, map cells or flat cell indices
+            (an array of cell indices is returned as is)
+        :return: An array of cell indices
+        """
+        if isinstance(locations, np.ndarray):
+            return locations
+        indices = np.empty(len(locations), dtype=np.intp)
+        for i, location in enumerate(locations):
+            if isinstance(location, Entity):
+                location = location.position
+            elif isinstance(location, MapCell):
+                location = location.index
+            if isinstance(location, Position):
+                indices[i] = (location.y % self.height) * self.width + location.x % self.width
+            else:
+                indices[i] = location
+        return indices
+
+    def distances(self, sources, targets=None):
+        """
+        Computes the wrap-around Manhattan distances from many sources to many targets at once.
+        :param sources: Positions, entities, map cells or flat cell indices
+        :param targets: Positions, entities, map cells or flat cell indices (every cell on the map if None)
+        :return: An integer array of shape (len(sources), len(targets)) (or (len(sources), width * height))
+        """
+        source_indices = self.location_indices(sources)
+        if targets is None:
+            target_indices = np.arange(self.width * self.height)
+        else:
+            target_indices = self.location_indices(targets)
+        source_y, source_x = np.divmod(source_indices, self.width)
+        target_y, target_x = np.divmod(target_indices, self.width)
+        return self.positions.x_wrap_array[(source_x[:, None] - target_x[None, :]) % self.width] + \
+            self.positions.y_wrap_array[(source_y[:, None] - target_y[None, :]) % self.height]
 
     def get_closest(self, source, entities):
         """
@@ -109,7 +293,6 @@ class GameMap:
         the ID and position of the closest entity to the position.
         """
         if len(entities) == 0: return None, None
-        source = self.normalize(source)
         min_dist = float('inf')
         closest_entity = None
         for entity in entities:
@@ -119,34 +302,200 @@ class GameMap:
                 closest_entity = entity
         return closest_entity.id, closest_entity.position
 
+    def get_closest_batch(self, sources, entities):
+        """
+        Vectorized get_closest for many sources (e.g. all of a player's ships) at once.
+        :param sources: Positions, entities, map cells or flat cell indices
+        :param entities: The entities to choose from
+        :return: A (closest, distance) pair of arrays: entities[closest[k]] is the
+            entity closest to sources[k], at distance distance[k]. Both are None
+            if there are no entities.
+        """
+        if len(entities) == 0: return None, None
+        distances = self.distances(sources, entities)
+        closest = distances.argmin(axis=1)
+        return closest, distances[np.arange(len(closest)), closest]
+
     def at_dropoff(self, source, player_id):
         """Returns whether a position contains a friendly shipyard or dropoff"""
         source = self.normalize(source)
         return self[source].has_structure and self[source].structure.owner == player_id
 
+    def update_inspiration(self, player_ids):
+        """
+        Builds the inspiration grid of every player from the ships currently on
+        the map: for each cell, whether a ship of that player sitting there would
+        be inspired. Afterwards is_inspired, get_move_cost, get_collect_amt and
+        is_inspired_at are O(1) lookups (until the next _update).
+        :param player_ids: The ids of all players in the game
+        :return: nothing
+        """
+        self._inspired = {}
+        if not constants.INSPIRATION_ENABLED:
+            return
+        owners = self.as_grid(self.ship_owner)
+        ship_counts = np.stack([owners == player_id for player_id in player_ids]).astype(np.int16)
+        nearby_counts = util.diamond_sum(ship_counts, constants.INSPIRATION_RADIUS)
+        enemy_counts = nearby_counts.sum(axis=0) - nearby_counts
+        for player_idx, player_id in enumerate(player_ids):
+            self._inspired[player_id] = (enemy_counts[player_idx] >= constants.INSPIRATION_SHIP_COUNT).reshape(-1)
+
+    def update_threats(self, player_ids):
+        """
+        Builds the threat map of every player from the ships currently on the
+        map (see navigation.ThreatMap). Afterwards opponent_adjacent is an O(1)
+        lookup and get_threat_map exposes the full grids (until the next _update).
+        Ships set on or cleared from cells afterwards are reflected in the grids.
+        :param player_ids: The ids of all players in the game
+        :return: nothing
+        """
+        cargo = np.full(self.width * self.height, -1, dtype=np.int32)
+        for index, ship in self._ships.items():
+            cargo[index] = ship.halite_amount
+        self._threats = {player_id: ThreatMap(self, player_id, cargo) for player_id in player_ids}
+
+    def get_threat_map(self, player_id):
+        """
+        :return: This turn's ThreatMap of a player (see update_threats), or None if not built
+        """
+        return self._threats.get(player_id)
+
+    def get_move_costs(self, player_id):
+        """
+        Returns what it costs a player's ship to move off each cell this turn,
+        accounting for inspiration if the inspiration grids were built.
+        :param player_id: The player moving
+        :return: A flat integer array with one entry per cell
+        """
+        move_costs = self._move_costs.get(player_id)
+        if move_costs is None:
+            move_costs = self.halite // constants.MOVE_COST_RATIO
+            inspired = self.get_inspired_grid(player_id)
+            if inspired is not None:
+                move_costs = np.where(inspired, self.halite // constants.INSPIRED_MOVE_COST_RATIO, move_costs)
+            self._move_costs[player_id] = move_costs
+        return move_costs
+
+    def get_path_search(self, destination, player_id):
+        """
+        Returns this turn's (cached) cheapest-path search into a destination for
+        a player, see navigation.PathSearch. Ships heading to the same
+        destination share one search.
+        :param destination: A position, entity or cell index
+        :param player_id: The player moving
+        :return: The PathSearch
+        """
+        key = (player_id, self[destination].index)
+        search = self._path_searches.get(key)
+        if search is None:
+            search = self._path_searches[key] = PathSearch(self, destination, self.get_move_costs(player_id))
+        return search
+
+    def find_path(self, source, destination, player_id, deadline=None):
+        """
+        Finds the cheapest path (least halite burned, then fewest moves) between two locations.
+        :param source: The starting position
+        :param destination: The destination
+        :param player_id: The player moving
+        :param deadline: Optional timing.Deadline
+        :return: The list of Directions to take (empty if source is the destination), or None
+            if the deadline expired before the path was found
+        """
+        return self.get_path_search(destination, player_id).path_from(source, deadline)
+
+    def get_target_candidates(self, score=None):
+        """
+        Returns the index of cells holding more halite than the mean of their
+        neighbors (see targeting.CandidateIndex), built on first use and then
+        updated incrementally by every _update. Halite written directly through
+        MapCell.halite_amount is not tracked.
+        :param score: Optional function from a cell index to its sort score, used when the index is first built
+        :return: The CandidateIndex
+        """
+        if self._candidate_index is None:
+            self._candidate_index = CandidateIndex(self, score)
+        return self._candidate_index
+
+    def get_reservations(self, horizon=10):
+        """
+        Returns the space-time reservation table for cooperative multi-turn
+        planning (see navigation.ReservationTable), built on first use and then
+        advanced by every _update. It holds the plans of one player's ships.
+        :param horizon: How many turns ahead cells can be reserved, used when the table is first built
+        :return: The ReservationTable
+        """
+        if self._reservations is None:
+            self._reservations = ReservationTable(self, horizon)
+        return self._reservations
+
+    def get_return_field(self, player_id):
+        """
+        Returns the cheapest-way-home field for a player (see navigation.ReturnField),
+        built on first use each turn. Build it after update_frame so that the
+        player's structures and inspiration are known.
+        :param player_id: The player whose shipyard and dropoffs are home
+        :return: The ReturnField
+        """
+        field = self._return_fields.get(player_id)
+        if field is None:
+            field = self._return_fields[player_id] = ReturnField(self, player_id)
+        return field
+
+    def get_halite_sums(self, exclude_occupied=False, max_radius=None):
+        """
+        Returns this turn's (cached) diamond sums of halite (see util.DiamondSums):
+        total, count and mean halite within a Manhattan radius of any cell index in
+        O(1), or the whole board's radius sums at once with grid. Built on first use
+        each turn; with exclude_occupied, cells occupied or marked unsafe at that
+        point are left out.
+        :param exclude_occupied: Whether to leave out occupied cells
+        :param max_radius: The largest radius needed (smaller builds faster); defaults to just under half the map
+        :return: The DiamondSums
+        """
+        key = (exclude_occupied, max_radius)
+        sums = self._halite_sums.get(key)
+        if sums is None:
+            mask = self.as_grid(self.ship_owner < 0) if exclude_occupied else None
+            sums = self._halite_sums[key] = util.DiamondSums(self.as_grid(self.halite), max_radius, mask)
+        return sums
+
+    def get_inspired_grid(self, player_id):
+        """
+        :return: The flat boolean inspiration grid of a player (see update_inspiration), or None if not built
+        """
+        return self._inspired.get(player_id)
+
+    def is_inspired_at(self, location, player_id):
+        """Returns whether a ship of the given player would be inspired at a location"""
+        if not constants.INSPIRATION_ENABLED:
+            return False
+        index = self[location].index
+        inspired = self._inspired.get(player_id)
+        if inspired is not None:
+            return bool(inspired[index])
+        opp_ship_count = 0
+        for near_pos in self.positions.positions[index].get_within_radius(constants.INSPIRATION_RADIUS):
+            if self[near_pos].is_occupied and self[near_pos].ship.owner != player_id:
+                opp_ship_count += 1
+        return opp_ship_count >= constants.INSPIRATION_SHIP_COUNT
+
     def is_inspired(self, ship):
         """Returns whether the ship is inspired"""
-        if constants.INSPIRATION_ENABLED:
-            opp_ship_count = 0
-            for near_pos in ship.position.get_within_radius(constants.INSPIRATION_RADIUS):
-                if self[near_pos].is_occupied and self[near_pos].ship.owner != ship.owner:
-                    opp_ship_count += 1
-            if opp_ship_count >= constants.INSPIRATION_SHIP_COUNT:
-                return True
-        return False
+        return self.is_inspired_at(ship.position, ship.owner)
 
     def get_move_cost(self, ship):
         """Returns the cost to move the ship in any direction"""
-        cost_to_move = self[ship.position].halite_amount // constants.MOVE_COST_RATIO
+        halite_amount = self[ship.position].halite_amount
         if self.is_inspired(ship):
-            cost_to_move = self[ship.position].halite_amount // constants.INSPIRED_MOVE_COST_RATIO
-        return cost_to_move
+            return halite_amount // constants.INSPIRED_MOVE_COST_RATIO
+        return halite_amount // constants.MOVE_COST_RATIO
 
     def get_collect_amt(self, ship):
         """Returns the amount of halite gained by ship staying still"""
-        gain_of_stay = math.ceil(self[ship.position].halite_amount / constants.EXTRACT_RATIO)
+        halite_amount = self[ship.position].halite_amount
+        gain_of_stay = math.ceil(halite_amount / constants.EXTRACT_RATIO)
         if self.is_inspired(ship):
-            gain_of_stay += math.ceil(self[ship.position].halite_amount / constants.INSPIRED_EXTRACT_RATIO) * constants.INSPIRED_BONUS_MULTIPLIER
+            gain_of_stay += math.ceil(halite_amount / constants.INSPIRED_EXTRACT_RATIO) * constants.INSPIRED_BONUS_MULTIPLIER
         gain_of_stay = min(gain_of_stay, constants.MAX_HALITE - ship.halite_amount)
         return math.ceil(gain_of_stay)
 
@@ -157,9 +506,9 @@ class GameMap:
         height bounds, and places it within those bounds considering
         wraparound.
         :param position: A position object.
-        :return: A normalized position object fitting within the bounds of the map
+        :return: A normalized (interned) position object fitting within the bounds of the map
         """
-        return Position(position.x % self.width, position.y % self.height)
+        return self.positions.get(position.x, position.y)
 
     @staticmethod
     def _get_target_direction(source, target):
@@ -214,8 +563,12 @@ class GameMap:
     def opponent_adjacent(self, position, my_id):
         """
         Returns whether any positions adjacent to the given position are
-        occupied by enemy ships.
+        occupied by enemy ships. Looks up the threat map if it was built this
+        turn (see update_threats).
         """
+        threats = self._threats.get(my_id)
+        if threats is not None:
+            return threats.is_adjacent(position)
         position = self.normalize(position)
         for nbr_pos in position.get_surrounding_cardinals():
             if self[nbr_pos].is_occupied and self[nbr_pos].ship.owner != my_id:
@@ -263,43 +616,29 @@ class GameMap:
 
         return Direction.Still
 
-    def cost_navigate(self, ship, destination):
-        source = self.normalize(ship.position)
-        destination = self.normalize(destination)
-        if source == destination:
+    def cost_navigate(self, ship, destination, deadline=None):
+        """
+        Returns a singular safe move along the cheapest path to the destination
+        (see find_path), or Still if that move is blocked. Falls back to
+        naive_navigate if the deadline expires before the path is found.
+
+        :param ship: The ship to move.
+        :param destination: Ending position
+        :param deadline: Optional timing.Deadline
+        :return: A direction.
+        """
+        path = self.find_path(ship.position, destination, ship.owner, deadline)
+        if path is None:
+            return self.naive_navigate(ship, destination)
+        if not path:
             return Direction.Still
 
-        # Use UCS search to find cheapest path to destination
-        frontier = util.PriorityQueue()
-        predecessors = {}
-        visited_pos = set([])
-        frontier.update(source, 0)
-        nav_directions = []
-
-        while not frontier.empty():
-            pos, g_cost = frontier.pop_min()
-            visited_pos.add(pos)
-
-            if pos == destination:
-                curr_pos = destination
-                while curr_pos != source:
-                    dir, curr_pos = predecessors[curr_pos]
-                    nav_directions.insert(0, dir)
-                break
-
-            move_cost = math.floor(self[pos].halite_amount * 0.1)
-            dirs = Direction.get_all_cardinals()
-            for dir in dirs:
-                new_pos = pos.directional_offset(dir)
-                if new_pos not in visited_pos and frontier.update(new_pos, g_cost + move_cost):
-                    predecessors[new_pos] = (dir, pos)
-
-        best_dir = nav_directions[0]
-        target_pos = source.directional_offset(best_dir)
+        best_dir = path[0]
+        target_pos = ship.position.directional_offset(best_dir)
         if not self[target_pos].is_occupied:
             self[target_pos].mark_unsafe(ship)
             return best_dir
-        self[source].mark_unsafe(ship)
+        self[ship.position].mark_unsafe(ship)
         return Direction.Still
 
     @staticmethod
@@ -309,26 +648,38 @@ class GameMap:
         :return: The map object
         """
         map_width, map_height = map(int, read_input().split())
-        game_map = [[None for _ in range(map_width)] for _ in range(map_height)]
-        for y_position in range(map_height):
-            cells = read_input().split()
-            for x_position in range(map_width):
-                game_map[y_position][x_position] = MapCell(Position(x_position, y_position,
-                                                                    normalize=False),
-                                                           int(cells[x_position]))
-        return GameMap(game_map, map_width, map_height)
+        halite = []
+        for _ in range(map_height):
+            halite.extend(map(int, read_input().split()))
+        return GameMap(halite, map_width, map_height)
 
-    def _update(self):
+    def _update(self, frame, offset):
         """
         Updates this map object from the input given by the game engine
+        :param frame: The turn's integers as read by FrameReader
+        :param offset: Where the changed cell count starts in the frame
         :return: nothing
         """
         # Mark cells as safe for navigation (will re-mark unsafe cells
-        # later)
-        for y in range(self.height):
-            for x in range(self.width):
-                self[Position(x, y)].ship = None
-
-        for _ in range(int(read_input())):
-            cell_x, cell_y, cell_energy = map(int, read_input().split())
-            self[Position(cell_x, cell_y)].halite_amount = cell_energy
+        # later). Only the cells that are currently marked need resetting.
+        if self._ships:
+            marked = np.fromiter(self._ships, dtype=np.intp, count=len(self._ships))
+            self.ship_owner[marked] = -1
+            self.ship_id[marked] = -1
+            self._ships.clear()
+        self._inspired = {}
+        self._threats = {}
+        self._return_fields = {}
+        self._move_costs = {}
+        self._path_searches = {}
+        self._halite_sums = {}
+        if self._reservations is not None:
+            self._reservations._advance()
+
+        num_cells = frame[offset]
+        if num_cells > 0:
+            cells = np.array(frame[offset + 1:offset + 1 + 3 * num_cells]).reshape(num_cells, 3)
+            changed = cells[:, 1] * self.width + cells[:, 0]
+            self.halite[changed] = cells[:, 2]
+            if self._candidate_index is not None:
+                self._candidate_index._refresh(changed)
@@ -0,0 +1,459 @@
+import heapq
+
+import numpy as np
+
+from .positionals import DIRECTIONS
+
+
+def _neighbor_min(grid):
+    """Returns, for every cell of a (height, width) grid, the minimum over its four cardinal neighbors (wrapping)"""
+    return np.minimum(np.minimum(np.roll(grid, 1, axis=0), np.roll(grid, -1, axis=0)),
+                      np.minimum(np.roll(grid, 1, axis=1), np.roll(grid, -1, axis=1)))
+
+
+class ReturnField:
+    """
+    Cheapest way home from every cell of the map for one player.
+
+    Built from a multi-source shortest path search seeded from all of the
+    player's structures (shipyard and dropoffs), where moving off a cell costs
+    what the engine charges for it (halite // MOVE_COST_RATIO, or the inspired
+    ratio where that player's ships would be inspired). Ties in halite burned
+    are broken by the number of moves.
+
+    All arrays are flat, indexed by cell index (y * width + x):
+        cost: minimum halite burned to reach a friendly structure
+        steps: number of moves along that cheapest route
+        next_direction: direction code (index into positionals.DIRECTIONS) of
+            the first move along that route (Still on structures)
+    """
+    def __init__(self, game_map, player_id):
+        self._game_map = game_map
+        size = game_map.width * game_map.height
+        neighbors = game_map.positions.neighbor_array[:, :4]
+
+        move_cost = game_map.get_move_costs(player_id)
+
+        # Cost and steps are packed into one integer key (cost * size + steps) so
+        # that comparing keys compares cost first, then steps
+        edge = move_cost.astype(np.int64) * size + 1
+        key = np.full(size, np.iinfo(np.int64).max // 2, dtype=np.int64)
+        key[game_map.structure_owner == player_id] = 0
+
+        # Relax every cell against its neighbors at once until nothing improves
+        edge = game_map.as_grid(edge)
+        key = game_map.as_grid(key)
+        while True:
+            relaxed = np.minimum(key, _neighbor_min(key) + edge)
+            if np.array_equal(relaxed, key):
+                break
+            key = relaxed
+        key = key.reshape(-1)
+        edge = edge.reshape(-1)
+
+        through = key[neighbors] + edge[:, None]
+        self.cost, self.steps = np.divmod(key, size)
+        self.next_direction = through.argmin(axis=1)
+        self.next_direction[key == 0] = len(DIRECTIONS) - 1
+
+    def cost_from(self, location):
+        """
+        :return: The minimum halite burned to get from a location to a friendly structure
+        """
+        return int(self.cost[self._game_map[location].index])
+
+    def steps_from(self, location):
+        """
+        :return: The number of moves along the cheapest route home from a location
+        """
+        return int(self.steps[self._game_map[location].index])
+
+    def get_next_direction(self, location):
+        """
+        :return: The Direction of the first move along the cheapest route home from a location
+        """
+        return DIRECTIONS[self.next_direction[self._game_map[location].index]]
+
+
+class ThreatMap:
+    """
+    Where one player's ships are in danger from enemy ships this turn.
+
+    All arrays are flat, indexed by cell index (y * width + x):
+        adjacent: whether an enemy ship is on a cardinal neighbor of the cell
+        reach: whether an enemy ship could be on the cell next turn (it is on
+            the cell or on a cardinal neighbor)
+        max_cargo: the most halite carried by an enemy ship that could be on
+            the cell next turn (-1 where none can)
+
+    GameMap keeps the arrays in step with the ships on the map while the turn
+    goes on (e.g. when the bot ignores an enemy ship sitting on its shipyard),
+    see _set_ship.
+    """
+    def __init__(self, game_map, player_id, cargo):
+        """
+        :param game_map: The game map
+        :param player_id: The player whose enemies are the threat
+        :param cargo: Flat array of the halite carried by the ship on each cell (-1 where there is none)
+        """
+        self._game_map = game_map
+        self.player_id = player_id
+        enemy = (game_map.ship_owner >= 0) & (game_map.ship_owner != player_id)
+        self._enemy_cargo = np.where(enemy, cargo, -1)  # halite of the enemy ship on each cell, -1 where none
+        neighbor_cargo = self._enemy_cargo[game_map.positions.neighbor_array[:, :4]].max(axis=1)
+        self.max_cargo = np.maximum(neighbor_cargo, self._enemy_cargo)
+        self.adjacent = neighbor_cargo >= 0
+        self.reach = self.max_cargo >= 0
+
+    def _set_ship(self, index, ship):
+        """Updates the cells a ship on cell index (or None) is a threat to, when that cell's ship changes"""
+        cargo = ship.halite_amount if ship is not None and ship.owner != self.player_id else -1
+        if cargo == self._enemy_cargo[index]:
+            return
+        self._enemy_cargo[index] = cargo
+        neighbor_indices = self._game_map.positions.neighbor_indices
+        for cell in neighbor_indices[index]:
+            neighbor_cargo = max(self._enemy_cargo[neighbor] for neighbor in neighbor_indices[cell][:4])
+            self.max_cargo[cell] = max(neighbor_cargo, self._enemy_cargo[cell])
+            self.adjacent[cell] = neighbor_cargo >= 0
+            self.reach[cell] = self.max_cargo[cell] >= 0
+
+    def is_adjacent(self, location):
+        """
+        :return: Whether an enemy ship is next to a location
+        """
+        return bool(self.adjacent[self._game_map[location].index])
+
+    def is_reachable(self, location):
+        """
+        :return: Whether an enemy ship could be on a location next turn
+        """
+        return bool(self.reach[self._game_map[location].index])
+
+    def max_cargo_at(self, location):
+        """
+        :return: The most halite carried by an enemy ship that could be on a location next turn (-1 if none can)
+        """
+        return int(self.max_cargo[self._game_map[location].index])
+
+
+class _BucketQueue:
+    """
+    Dial's bucket queue for small non-negative integer keys.
+
+    Each bucket is a heap ordered by a secondary tiebreak key. Entries are
+    never updated in place: callers push again with the better key and skip
+    stale entries when they are popped.
+    """
+    def __init__(self):
+        self._buckets = []
+        self._current = 0
+
+    def push(self, key, tiebreak, node):
+        while len(self._buckets) <= key:
+            self._buckets.append([])
+        if key < self._current:
+            self._current = key
+        heapq.heappush(self._buckets[key], (tiebreak, node))
+
+    def pop(self):
+        """
+        :return: The node with the smallest (key, tiebreak), or None if the queue is empty
+        """
+        buckets = self._buckets
+        while self._current < len(buckets):
+            bucket = buckets[self._current]
+            if bucket:
+                return heapq.heappop(bucket)[1]
+            self._current += 1
+        return None
+
+
+class PathSearch:
+    """
+    Resumable A* search for the cheapest paths into one destination.
+
+    The search runs backwards from the destination, so every cell it closes
+    knows its cheapest path (least halite burned, then fewest moves) to the
+    destination. Asking for the path from another source reuses everything
+    found so far and only resumes the search if that source isn't closed yet,
+    re-keying the open cells for the new source.
+
+    The heuristic is the toroidal Manhattan distance scaled by the cheapest
+    move cost on the map (plus the distance itself for the move count), and
+    since move costs are small integers the open list is a bucket queue.
+    """
+    def __init__(self, game_map, destination, move_costs):
+        self._game_map = game_map
+        self._move_costs = move_costs.tolist()
+        self._min_move_cost = int(move_costs.min())
+        self.destination = game_map[destination].index
+
+        size = game_map.width * game_map.height
+        self.cost = [float('inf')] * size
+        self.steps = [0] * size
+        self.next_hop = [-1] * size
+        self.closed = bytearray(size)
+        self._open = set()
+        self._queue = None
+        self._target = None
+
+        self.cost[self.destination] = 0
+        self.next_hop[self.destination] = self.destination
+        self._open.add(self.destination)
+
+    def _distance(self, index, target):
+        width = self._game_map.width
+        positions = self._game_map.positions
+        return positions.x_wrap[(index % width - target % width) % width] + \
+            positions.y_wrap[(index // width - target // width) % self._game_map.height]
+
+    def _push(self, index):
+        distance = self._distance(index, self._target)
+        self._queue.push(self.cost[index] + distance * self._min_move_cost, self.steps[index] + distance, index)
+
+    def _search(self, target, deadline=None):
+        """Expands cells until target is closed; returns False if the deadline expired first"""
+        if target != self._target:
+            self._target = target
+            self._queue = _BucketQueue()
+            for index in self._open:
+                self._push(index)
+
+        neighbor_indices = self._game_map.positions.neighbor_indices
+        cost, steps, closed, move_costs = self.cost, self.steps, self.closed, self._move_costs
+        expansions = 0
+        while not closed[target]:
+            expansions += 1
+            if deadline is not None and expansions % deadline.CHECK_INTERVAL == 0 and deadline.expired():
+                return False
+            index = self._queue.pop()
+            if index is None:
+                return False
+            if closed[index]:
+                continue
+            closed[index] = 1
+            self._open.discard(index)
+
+            for neighbor in neighbor_indices[index][:4]:
+                if closed[neighbor]:
+                    continue
+                # moving neighbor -> index costs what it takes to leave neighbor
+                new_cost = cost[index] + move_costs[neighbor]
+                new_steps = steps[index] + 1
+                if new_cost < cost[neighbor] or (new_cost == cost[neighbor] and new_steps < steps[neighbor]):
+                    cost[neighbor] = new_cost
+                    steps[neighbor] = new_steps
+                    self.next_hop[neighbor] = index
+                    self._open.add(neighbor)
+                    self._push(neighbor)
+        return True
+
+    def path_from(self, source, deadline=None):
+        """
+        Returns the cheapest path from a source to the destination.
+        :param source: A position, entity or cell index
+        :param deadline: Optional timing.Deadline; the search can be resumed later if it expires
+        :return: The list of Directions to take (empty if source is the destination), or None
+            if the deadline expired before the path was found
+        """
+        index = self._game_map[source].index
+        if not self._search(index, deadline):
+            return None
+        neighbor_indices = self._game_map.positions.neighbor_indices
+        path = []
+        while index != self.destination:
+            next_index = self.next_hop[index]
+            path.append(DIRECTIONS[neighbor_indices[index].index(next_index)])
+            index = next_index
+        return path
+
+    def cost_from(self, source):
+        """
+        :return: The minimum halite burned on the way from a source to the destination
+        """
+        index = self._game_map[source].index
+        self._search(index)
+        return self.cost[index]
+
+
+class ReservationTable:
+    """
+    Space-time reservations of cells by one player's ships over the next few turns.
+
+    Each of the next `horizon` turns has its own occupancy map (a bytearray
+    with one byte per cell), kept in a ring buffer indexed by turn % horizon:
+    when a turn passes its map is cleared and reused for the turn that just
+    came into view. Ships plan their next moves with a cooperative A* (see
+    plan) around the cells earlier plans have reserved, so ships converging on
+    the same area (e.g. a shipyard when recalling) take turns instead of
+    blocking each other.
+
+    The table persists across turns. GameMap._update advances it every turn;
+    repair then drops the plans of ships that didn't move as planned so only
+    those ships need to plan again.
+    """
+    def __init__(self, game_map, horizon=10):
+        """
+        :param game_map: The game map
+        :param horizon: How many turns ahead (including the current one) cells can be reserved
+        """
+        self._game_map = game_map
+        self.horizon = horizon
+        self._size = game_map.width * game_map.height
+        self._occupancy = [bytearray(self._size) for _ in range(horizon)]
+        self.turn = 0      # turns counted from when the table was built
+        self._plans = {}   # ship id -> (turn of the plan's first cell, list of cell indices, one per turn)
+
+    def _advance(self):
+        """Moves on to the next turn, freeing the ring slot of the turn that passed"""
+        self._occupancy[self.turn % self.horizon] = bytearray(self._size)
+        self.turn += 1
+
+    def _row(self, turn):
+        return self._occupancy[turn % self.horizon]
+
+    def is_reserved(self, location, turns_ahead=0):
+        """
+        :param location: A position, entity or cell index
+        :param turns_ahead: How many turns from now (less than the horizon)
+        :return: Whether a ship has reserved the location for that turn
+        """
+        return bool(self._row(self.turn + turns_ahead)[self._game_map[location].index])
+
+    def reserve(self, ship_id, cells, shared=()):
+        """
+        Reserves a ship's planned cells, replacing its previous plan.
+        :param ship_id: The ship's id
+        :param cells: Cell indices the ship will be on, starting with the current turn
+        :param shared: Cell indices left unreserved (any number of ships may use them)
+        :return: nothing
+        """
+        self.release(ship_id)
+        self._plans[ship_id] = (self.turn, list(cells))
+        for turn, cell in enumerate(cells, self.turn):
+            if turn >= self.turn + self.horizon:
+                break
+            if cell not in shared:
+                self._row(turn)[cell] = 1
+
+    def release(self, ship_id):
+        """
+        Drops a ship's plan and frees the cells it still had reserved.
+        :param ship_id: The ship's id
+        :return: nothing
+        """
+        plan = self._plans.pop(ship_id, None)
+        if plan is None:
+            return
+        start, cells = plan
+        for turn, cell in enumerate(cells, start):
+            if self.turn <= turn < self.turn + self.horizon:
+                self._row(turn)[cell] = 0
+
+    def repair(self, ships):
+        """
+        Checks every plan against where the ships actually are this turn.
+        Plans of ships that deviated from them, finished them or are gone are
+        dropped (freeing their reservations).
+        :param ships: The player's current ships
+        :return: The ships that have no plan for this turn and need to plan again
+        """
+        stale = []
+        present = set()
+        for ship in ships:
+            present.add(ship.id)
+            plan = self._plans.get(ship.id)
+            if plan is not None:
+                start, cells = plan
+                step = self.turn - start
+                if 0 <= step < len(cells) - 1 and cells[step] == self._game_map[ship].index:
+                    continue
+                self.release(ship.id)
+            stale.append(ship)
+        for ship_id in [ship_id for ship_id in self._plans if ship_id not in present]:
+            self.release(ship_id)
+        return stale
+
+    def next_direction(self, ship):
+        """
+        :return: The Direction of the ship's next planned move (Still if it has no plan for this turn)
+        """
+        plan = self._plans.get(ship.id)
+        if plan is None:
+            return DIRECTIONS[-1]
+        start, cells = plan
+        step = self.turn - start
+        if not 0 <= step < len(cells) - 1:
+            return DIRECTIONS[-1]
+        return DIRECTIONS[self._game_map.positions.neighbor_indices[cells[step]].index(cells[step + 1])]
+
+    def plan(self, ship, destination, shared=()):
+        """
+        Plans and reserves a ship's moves for the next horizon turns towards a
+        destination with a space-time A* over (cell, turn): every turn the ship
+        moves to a cardinal neighbor or waits, never onto a cell reserved for
+        that turn, and never onto a cell an enemy ship is on for its first move.
+        If the destination can't be reached within the horizon, the plan ends
+        as close to it as possible; a ship that arrives early waits there.
+        :param ship: The ship to plan for
+        :param destination: Where the ship is heading
+        :param shared: Locations that are never reserved (e.g. dropoffs when recalling)
+        :return: The list of Directions planned (possibly shorter than the horizon)
+        """
+        game_map = self._game_map
+        positions = game_map.positions
+        neighbor_indices = positions.neighbor_indices
+        x_wrap, y_wrap = positions.x_wrap, positions.y_wrap
+        width, height, size = game_map.width, game_map.height, self._size
+        shared = {game_map[location].index for location in shared}
+        start = game_map[ship].index
+        goal = game_map[destination].index
+        goal_x, goal_y = goal % width, goal // width
+        enemies = {index for index, other in game_map.ships_by_index().items() if other.owner != ship.owner}
+        self.release(ship.id)
+        rows = [self._row(self.turn + step) for step in range(self.horizon)]
+
+        def distance(index):
+            return x_wrap[(index % width - goal_x) % width] + y_wrap[(index // width - goal_y) % height]
+
+        # Every move (waiting included) takes one turn, so a node's cost is its turn and the
+        # first time a (turn, cell) node is reached is along a shortest path to it. Ties in
+        # the estimate go to the later turn, which heads straight for the goal.
+        parent = {start: None}  # node (step * size + cell) -> previous node
+        heap = [(distance(start), 0, start)]
+        best = (distance(start), 0, start)
+        while heap:
+            estimate, step, cell = heapq.heappop(heap)
+            step = -step
+            remaining = estimate - step
+            if (remaining, step) < best[:2]:
+                best = (remaining, step, cell)
+            if cell == goal or step == self.horizon - 1:
+                break
+            row = rows[step + 1]
+            for neighbor in neighbor_indices[cell]:
+                if row[neighbor] and neighbor not in shared:
+                    continue
+                if step == 0 and neighbor in enemies and neighbor != cell:
+                    continue
+                node = (step + 1) * size + neighbor
+                if node not in parent:
+                    parent[node] = step * size + cell
+                    heapq.heappush(heap, (step + 1 + distance(neighbor), -step - 1, neighbor))
+
+        _, step, cell = best
+        node = step * size + cell
+        cells = []
+        while node is not None:
+            cells.append(node % size)
+            node = parent[node]
+        cells.reverse()
+        if cell not in shared:
+            # wait at the end of the plan for the rest of the horizon, where that cell is free
+            for step in range(len(cells), self.horizon):
+                if rows[step][cell]:
+                    break
+                cells.append(cell)
+        self.reserve(ship.id, cells, shared)
+        return [DIRECTIONS[neighbor_indices[here].index(there)] for here, there in zip(cells, cells[1:])]
@@ -1,22 +1,64 @@
 import json
 import logging
 import sys
+import threading
+import time
 
-from .common import read_input
+from .common import read_input, setup_logging, FrameReader
 from . import constants
+from .encoding import CommandEncoder
 from .game_map import GameMap, Player
+from .timing import Deadline, TurnProfiler
 
 
 class Game:
     """
     The game object holds all metadata pertinent to the game and all its contents
     """
-    def __init__(self):
+    def __init__(self, inspiration_map=True, threat_map=False, turn_budget=1.5, fallback_after=1.8,
+                 profile=False, profile_path=None, log_level=None, log_queue=True, log_max_bytes=None,
+                 log_compress=False, startup_budget=5.0):
         """
         Initiates a game object collecting all start-state instances for the contained items for pre-game.
         Also sets up basic logging.
+        :param inspiration_map: Whether update_frame builds the per-player inspiration grids
+            (see GameMap.update_inspiration)
+        :param threat_map: Whether update_frame builds the per-player enemy threat maps
+            (see GameMap.update_threats)
+        :param turn_budget: Seconds after a frame arrives that planning may use; update_frame
+            sets game.deadline accordingly for planning stages to check
+        :param fallback_after: Seconds after a frame arrives at which the fallback commands
+            (see set_fallback) are sent automatically if end_turn hasn't been called yet.
+            None disables the fallback.
+        :param profile: Whether to record per-phase turn times in game.profiler (see timing.TurnProfiler).
+            update_frame records the "read" and "update" phases and end_turn the whole "turn"; after
+            the last turn the summary is logged and the times are written to profile_path.
+        :param profile_path: Where to write the turn times (defaults to bot-<id>-profile.csv)
+        :param log_level: Level of the bot-<id>.log file (see common.setup_logging; defaults to the
+            HALITE_LOG_LEVEL environment variable, else DEBUG; "OFF" disables logging)
+        :param log_queue: Whether log records are formatted and written on a background thread
+        :param log_max_bytes: If given, the log file rolls over once this large
+        :param log_compress: Whether to gzip the log file
+        :param startup_budget: Seconds after the game object is created within which ready runs the
+            startup tasks (see add_startup_task); tasks still pending once it's spent are skipped
         """
+        self._startup_start = time.perf_counter()
         self.turn_number = 0
+        self.encoder = _encoder  # encodes (and caches) commands, see encoding.CommandEncoder
+        self.inspiration_map = inspiration_map
+        self.threat_map = threat_map
+        self.turn_budget = turn_budget
+        self.fallback_after = fallback_after
+        self.deadline = None
+        self._frame_reader = FrameReader()
+        self._send_lock = threading.Lock()
+        self._fallback_timer = None
+        self._fallback_commands = []
+        self._turn_sent = False
+        self.startup_budget = startup_budget
+        self._startup_tasks = []  # (name, task) pairs run by ready, in order
+        from . import import_time
+        self.startup_times = {"import hlt": import_time}  # startup step name -> seconds it took (see ready)
 
         # Grab constants JSON
         raw_constants = read_input()
@@ -24,11 +66,7 @@ class Game:
 
         num_players, self.my_id = map(int, read_input().split())
 
-        logging.basicConfig(
-            filename="bot-{}.log".format(self.my_id),
-            filemode="w",
-            level=logging.DEBUG,
-        )
+        setup_logging("bot-{}.log".format(self.my_id), log_level, log_queue, log_max_bytes, log_compress)
 
         self.players = {}
         for player in range(num_players):
@@ -38,26 +76,64 @@ class Game:
 
         constants.set_dimensions(self.game_map.width, self.game_map.height)
 
+        self.profiler = TurnProfiler(enabled=profile)
+        self.profile_path = profile_path if profile_path is not None else "bot-{}-profile.csv".format(self.my_id)
+        self.startup_times["read game"] = time.perf_counter() - self._startup_start
+
+    def add_startup_task(self, name, task):
+        """
+        Registers work to do before the first turn, e.g. building lookup tables
+        or caches the first turn would otherwise pay for. Tasks run in ready, in
+        the order they were added, while the startup budget lasts.
+        :param name: The task's name in the startup report
+        :param task: A function taking the game object
+        :return: nothing.
+        """
+        self._startup_tasks.append((name, task))
+
     def ready(self, name):
         """
-        Indicate that your bot is ready to play.
+        Indicate that your bot is ready to play, after running the startup tasks
+        (see add_startup_task) and logging how long each step of startup took.
         :param name: The name of your bot
         """
+        deadline = Deadline(self.startup_budget, start=self._startup_start)
+        for task_name, task in self._startup_tasks:
+            if deadline.expired():
+                logging.warning("Startup budget of %.1fs spent, skipping startup task %s",
+                                self.startup_budget, task_name)
+                continue
+            start = time.perf_counter()
+            task(self)
+            self.startup_times[task_name] = time.perf_counter() - start
+        self._startup_tasks = []
+
+        total = self.startup_times["import hlt"] + time.perf_counter() - self._startup_start
+        logging.info("Startup took %.1fms (budget %.1fs after import):", 1000 * total, self.startup_budget)
+        for step, seconds in self.startup_times.items():
+            logging.info("    %-24s %8.1fms", step, 1000 * seconds)
         send_commands([name])
+        self._frame_reader.start()
 
     def update_frame(self):
         """
         Updates the game object's state.
         :returns: nothing.
         """
-        self.turn_number = int(read_input())
-        logging.info("=============== TURN {:03} ================".format(self.turn_number))
-
+        frame = self._frame_reader.read_frame(len(self.players))
+        arrival_time = self._frame_reader.arrival_time
+        self.deadline = Deadline(self.turn_budget, start=arrival_time)
+        self._start_fallback_timer(frame[0], arrival_time)
+        self.profiler.start_turn(self.turn_number)
+        self.profiler.record("read", time.perf_counter() - arrival_time)
+        logging.info("=============== TURN %03d ================", self.turn_number)
+
+        offset = 1
         for _ in range(len(self.players)):
-            player, num_ships, num_dropoffs, halite = map(int, read_input().split())
-            self.players[player]._update(num_ships, num_dropoffs, halite)
+            player, num_ships, num_dropoffs, halite = frame[offset:offset + 4]
+            offset = self.players[player]._update(num_ships, num_dropoffs, halite, frame, offset + 4)
 
-        self.game_map._update()
+        self.game_map._update(frame, offset)
 
         # Mark cells with ships as unsafe for navigation
         for player in self.players.values():
@@ -68,21 +144,76 @@ class Game:
             for dropoff in player.get_dropoffs():
                 self.game_map[dropoff.position].structure = dropoff
 
-    @staticmethod
-    def end_turn(commands):
+        if self.inspiration_map:
+            self.game_map.update_inspiration(list(self.players.keys()))
+        if self.threat_map:
+            self.game_map.update_threats(list(self.players.keys()))
+        self.profiler.split("update")
+
+    def set_fallback(self, commands):
+        """
+        Sets the commands to send if this turn runs out of time before end_turn
+        is called, e.g. the best plan found so far. Each turn starts with an
+        empty fallback (every ship stays still).
+        :param commands: Array of commands to send to engine
+        :return: nothing.
+        """
+        self._fallback_commands = list(commands)
+
+    def _start_fallback_timer(self, turn_number, arrival_time):
+        """Starts a new turn and arms the timer that sends its fallback commands"""
+        with self._send_lock:
+            self.turn_number = turn_number
+            self._turn_sent = False
+            self._fallback_commands = []
+        if self.fallback_after is None:
+            return
+        self._fallback_timer = threading.Timer(self.fallback_after - (time.perf_counter() - arrival_time),
+                                               self._send_fallback, args=(turn_number,))
+        self._fallback_timer.daemon = True
+        self._fallback_timer.start()
+
+    def _send_fallback(self, turn_number):
+        """Sends the fallback commands unless the turn was already ended (or is over)"""
+        with self._send_lock:
+            if self._turn_sent or turn_number != self.turn_number:
+                return
+            self._turn_sent = True
+            logging.warning("Turn %d ran out of time, sending %d fallback commands",
+                            self.turn_number, len(self._fallback_commands))
+            send_commands(self._fallback_commands)
+
+    def end_turn(self, commands):
         """
         Method to send all commands to the game engine, effectively ending your turn.
+        If the fallback commands were already sent for this turn, these are dropped.
         :param commands: Array of commands to send to engine
         :return: nothing.
         """
-        send_commands(commands)
+        if self._fallback_timer is not None:
+            self._fallback_timer.cancel()
+        self.profiler.record("turn", time.perf_counter() - self._frame_reader.arrival_time)
+        with self._send_lock:
+            if self._turn_sent:
+                logging.warning("Turn %d already ended with fallback commands, dropping late commands",
+                                self.turn_number)
+            else:
+                self._turn_sent = True
+                send_commands(commands)
+
+        if self.profiler.enabled and self.turn_number >= constants.MAX_TURNS:
+            self.profiler.log_summary()
+            self.profiler.dump(self.profile_path)
+
+
+_encoder = CommandEncoder()
 
 
 def send_commands(commands):
     """
-    Sends a list of commands to the engine.
-    :param commands: The list of commands to send.
+    Sends a list of commands to the engine in a single write.
+    :param commands: The list of commands to send, as strings or bytes (see Game.encoder).
     :return: nothing.
     """
-    print(" ".join(commands))
-    sys.stdout.flush()
+    _encoder.write(commands, sys.stdout.buffer)
+    sys.stdout.buffer.flush()
@@ -5,6 +5,11 @@ from .common import read_input
 class Player:
     """
     Player object containing all items/metadata pertinent to the player.
+
+    Ship objects persist across turns: existing ships are updated in place and
+    ships that the engine no longer reports are dropped. The ids of the ships
+    that appeared, were destroyed (or turned into dropoffs) and moved since
+    last turn are kept in the spawned, destroyed and moved sets.
     """
     def __init__(self, player_id, shipyard, halite=0):
         self.id = player_id
@@ -12,6 +17,9 @@ class Player:
         self.halite_amount = halite
         self._ships = {}
         self._dropoffs = {}
+        self.spawned = set()
+        self.destroyed = set()
+        self.moved = set()
 
     def get_ship(self, ship_id):
         """
@@ -63,14 +71,37 @@ class Player:
         player, shipyard_x, shipyard_y = map(int, read_input().split())
         return Player(player, Shipyard(player, -1, Position(shipyard_x, shipyard_y, normalize=False)))
 
-    def _update(self, num_ships, num_dropoffs, halite):
+    def _update(self, num_ships, num_dropoffs, halite, frame, offset):
         """
         Updates this player object considering the input from the game engine for the current specific turn.
         :param num_ships: The number of ships this player has this turn
         :param num_dropoffs: The number of dropoffs this player has this turn
         :param halite: How much halite the player has in total
-        :return: nothing.
+        :param frame: The turn's integers as read by FrameReader
+        :param offset: Where this player's ships start in the frame
+        :return: The frame offset just past this player's dropoffs
         """
         self.halite_amount = halite
-        self._ships = {id: ship for (id, ship) in [Ship._generate(self.id) for _ in range(num_ships)]}
-        self._dropoffs = {id: dropoff for (id, dropoff) in [Dropoff._generate(self.id) for _ in range(num_dropoffs)]}
+        dropoffs_offset = offset + 4 * num_ships
+        end = dropoffs_offset + 3 * num_dropoffs
+
+        previous_ships = self._ships
+        self._ships = {}
+        self.spawned = set()
+        self.moved = set()
+        for ship_offset in range(offset, dropoffs_offset, 4):
+            ship = previous_ships.pop(frame[ship_offset], None)
+            if ship is None:
+                ship_id, ship = Ship._generate(self.id, frame, ship_offset)
+                self.spawned.add(ship_id)
+            elif ship._update(frame, ship_offset):
+                self.moved.add(ship.id)
+            self._ships[ship.id] = ship
+        # Whatever was not reported this turn no longer exists
+        self.destroyed = set(previous_ships)
+
+        for drop_offset in range(dropoffs_offset, end, 3):
+            if frame[drop_offset] not in self._dropoffs:
+                dropoff_id, dropoff = Dropoff._generate(self.id, frame, drop_offset)
+                self._dropoffs[dropoff_id] = dropoff
+        return end
@@ -1,3 +1,5 @@
+import numpy as np
+
 from . import commands
 from . import constants
 
@@ -63,39 +65,60 @@ class Direction:
 
 
 class Position:
-    def __init__(self, x, y, normalize=True):
-        self.x = x
-        self.y = y
+    """
+    An immutable (x, y) location on the map.
+
+    Normalized positions are interned: Position(x, y) returns the single shared
+    instance for that cell from the PositionTable for the current map
+    dimensions, so offsets and neighbor lookups never allocate.
+    Positions created with normalize=False are standalone objects.
+    """
+    __slots__ = ('x', 'y')
 
-        if normalize:
-            self.normalize()
+    def __new__(cls, x, y, normalize=True):
+        if normalize and cls is Position:
+            return _current_table().get(x, y)
+        return cls._make(x, y)
+
+    @classmethod
+    def _make(cls, x, y):
+        position = object.__new__(cls)
+        object.__setattr__(position, 'x', x)
+        object.__setattr__(position, 'y', y)
+        return position
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position objects are immutable")
 
     def normalize(self):
-        self.x = self.x % constants.WIDTH
-        self.y = self.y % constants.HEIGHT
+        """
+        :return: The (interned) position wrapped within the bounds of the map
+        """
+        return _current_table().get(self.x, self.y)
 
     def directional_offset(self, direction):
         """
         Returns the position considering a Direction cardinal tuple
         :param direction: the direction cardinal tuple
-        :return: a new position moved in that direction
+        :return: the (interned) position moved in that direction
         """
-        return self + Position(*direction)
+        return _current_table().offset(self, direction)
 
     def get_surrounding_cardinals(self):
         """
-        :return: Returns a list of all positions around this specific position in each cardinal direction
+        :return: Returns a tuple of all positions around this specific position in each cardinal direction
         """
-        return [self.directional_offset(current_direction) for current_direction in Direction.get_all_cardinals()]
+        return _current_table().cardinals(self)
 
     def get_within_radius(self, radius):
         """Returns all positions that are at most a specified Manhattan distance away."""
+        table = _current_table()
         positions = []
         for new_x in range(self.x - radius, self.x + radius + 1):
             x_diff = abs(self.x - new_x)
             max_y_diff = radius - x_diff
             for new_y in range(self.y - max_y_diff, self.y + max_y_diff + 1):
-                positions.append(Position(new_x, new_y))
+                positions.append(table.get(new_x, new_y))
         return positions
 
     def __add__(self, other):
@@ -104,23 +127,11 @@ class Position:
     def __sub__(self, other):
         return Position(self.x - other.x, self.y - other.y)
 
-    def __iadd__(self, other):
-        self.x += other.x
-        self.y += other.y
-        self.normalize()
-        return self
-
-    def __isub__(self, other):
-        self.x -= other.x
-        self.y -= other.y
-        self.normalize()
-        return self
-
     def __abs__(self):
         return Position(abs(self.x), abs(self.y))
 
     def __eq__(self, other):
-        return self.x == other.x and self.y == other.y
+        return self is other or (self.x == other.x and self.y == other.y)
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -131,4 +142,127 @@ class Position:
                                    self.y)
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        return (self.y << 16) ^ self.x
+
+    def __reduce__(self):
+        return Position, (self.x, self.y, False)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+# Order of the directions in PositionTable's per-cell neighbor rows; a direction's
+# position in this tuple is its integer direction code
+DIRECTIONS = (Direction.North, Direction.South, Direction.East, Direction.West, Direction.Still)
+_DIRECTION_SLOTS = {direction: slot for slot, direction in enumerate(DIRECTIONS)}
+
+
+class PositionTable:
+    """
+    Interned positions and a precomputed toroidal neighbor table for one map size.
+
+    Cells are identified by the flat index y * width + x (the same indexing
+    GameMap uses for its grids). Tables are shared between all maps of the
+    same dimensions; use PositionTable.for_dimensions to get one.
+    """
+    _tables = {}
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.positions = [Position._make(index % width, index // width) for index in range(self.size)]
+
+        # neighbor_indices[index] = cell indices reached by moving North, South, East, West, Still
+        self.neighbor_indices = []
+        for index in range(self.size):
+            x, y = index % width, index // width
+            self.neighbor_indices.append(tuple(((y + dy) % height) * width + (x + dx) % width
+                                               for dx, dy in _DIRECTION_SLOTS))
+        self.neighbor_array = np.array(self.neighbor_indices, dtype=np.intp)
+        self._neighbors = [tuple(self.positions[nbr] for nbr in row) for row in self.neighbor_indices]
+        self._cardinals = [row[:4] for row in self._neighbors]
+
+        # x_wrap[d] / y_wrap[d]: toroidal distance along one axis between coordinates
+        # d apart (d taken modulo the axis length)
+        self.x_wrap = [min(d, width - d) for d in range(width)]
+        self.y_wrap = [min(d, height - d) for d in range(height)]
+        self.x_wrap_array = np.array(self.x_wrap, dtype=np.int32)
+        self.y_wrap_array = np.array(self.y_wrap, dtype=np.int32)
+
+    @staticmethod
+    def for_dimensions(width, height):
+        """
+        Returns the (cached) table for a map size, building it on first use.
+        :param width: The map width
+        :param height: The map height
+        :return: The PositionTable for that size
+        """
+        global _table
+        table = PositionTable._tables.get((width, height))
+        if table is None:
+            table = PositionTable._tables[(width, height)] = PositionTable(width, height)
+        _table = table
+        return table
+
+    def index(self, x, y):
+        """
+        :return: The flat cell index of the (wrapped) coordinates
+        """
+        return (y % self.height) * self.width + x % self.width
+
+    def index_of(self, position):
+        """
+        :return: The flat cell index of a position
+        """
+        return (position.y % self.height) * self.width + position.x % self.width
+
+    def get(self, x, y):
+        """
+        :return: The interned position for the (wrapped) coordinates
+        """
+        return self.positions[(y % self.height) * self.width + x % self.width]
+
+    def offset(self, position, direction):
+        """
+        Returns the interned position one step from a position.
+        :param position: The starting position
+        :param direction: A Direction cardinal tuple (or Still)
+        :return: The neighboring position
+        """
+        slot = _DIRECTION_SLOTS.get(direction)
+        if slot is None:
+            return self.get(position.x + direction[0], position.y + direction[1])
+        return self._neighbors[self.index_of(position)][slot]
+
+    def cardinals(self, position):
+        """
+        :return: The interned North, South, East and West neighbors of a position
+        """
+        return self._cardinals[self.index_of(position)]
+
+    def neighbor_index(self, index, direction):
+        """
+        :return: The flat index of the cell one step from a cell index
+        """
+        return self.neighbor_indices[index][_DIRECTION_SLOTS[direction]]
+
+    def cardinal_indices(self, index):
+        """
+        :return: The flat indices of the North, South, East and West neighbors of a cell index
+        """
+        return self.neighbor_indices[index][:4]
+
+
+_table = None
+
+
+def _current_table():
+    """Returns the PositionTable matching the current map dimensions"""
+    table = _table
+    if table is None or table.width != constants.WIDTH or table.height != constants.HEIGHT:
+        table = PositionTable.for_dimensions(constants.WIDTH, constants.HEIGHT)
+    return table
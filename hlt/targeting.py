@@ -0,0 +1,161 @@
+import bisect
+
+import numpy as np
+
+
+def score_targets(game_map, ships, candidates, dropoffs, delay_factor=1.0):
+    """
+    Scores every candidate target cell for every ship in one vectorized pass.
+
+    A candidate's score is its halite divided by the (delayed) number of turns
+    to reach it and then return from it to the ship's closest dropoff:
+        halite / max(1, delay_factor * (dist(ship, cell) + dist(cell, closest dropoff)))
+    :param game_map: The game map
+    :param ships: The ships to score targets for
+    :param candidates: Flat cell indices of the candidate target cells
+    :param dropoffs: The dropoffs (and shipyard) ships return to
+    :param delay_factor: Multiplier on travel times (stops to refuel or avoid collisions)
+    :return: A float array of shape (len(ships), len(candidates))
+    """
+    closest_drop, _ = game_map.get_closest_batch(ships, dropoffs)
+    time_to_target = game_map.distances(ships, candidates)
+    time_to_return = game_map.distances(dropoffs, candidates)[closest_drop]
+    travel_time = np.maximum(1.0, delay_factor * (time_to_target + time_to_return))
+    return game_map.halite[candidates] / travel_time
+
+
+def _claimed_bitmap(game_map, claimed):
+    """Returns a flat boolean array marking the claimed locations"""
+    taken = np.zeros(game_map.width * game_map.height, dtype=bool)
+    taken[game_map.location_indices(list(claimed))] = True
+    return taken
+
+
+def unclaimed(game_map, candidates, claimed):
+    """
+    Filters out candidate cells that are already targeted.
+    :param game_map: The game map
+    :param candidates: Flat cell indices of the candidate target cells
+    :param claimed: Locations (positions, entities or cell indices) that are already targeted
+    :return: The flat cell indices of the unclaimed candidates
+    """
+    candidates = np.asarray(candidates)
+    return candidates[~_claimed_bitmap(game_map, claimed)[candidates]]
+
+
+def pick_targets(game_map, scores, candidates, claimed, k=16, deadline=None):
+    """
+    Greedily gives each ship (in row order) its best-scoring candidate that
+    hasn't been claimed yet, claiming it for later ships.
+
+    Each row only needs its top k candidates (found with argpartition, then
+    sorted); the full row is sorted only if all k are already claimed.
+    :param game_map: The game map
+    :param scores: Scores as returned by score_targets
+    :param candidates: Flat cell indices of the candidate target cells
+    :param claimed: Locations (positions, entities or cell indices) that are already targeted
+    :param k: How many top candidates to consider per ship before falling back to a full sort
+    :param deadline: Optional timing.Deadline; once expired the remaining ships get None
+    :return: For each ship, the (interned) position of its target, or None if every candidate is claimed
+    """
+    taken = _claimed_bitmap(game_map, claimed)
+    candidates = np.asarray(candidates)
+    num_candidates = len(candidates)
+
+    targets = []
+    for row in scores:
+        target = None
+        if deadline is not None and deadline.expired():
+            targets.append(target)
+            continue
+        if num_candidates > k:
+            top = np.argpartition(-row, k)[:k]
+            order = [top[np.argsort(-row[top], kind='stable')]]
+        else:
+            order = []
+        order.append(np.argsort(-row, kind='stable'))
+        for ranked in order:
+            ranked_cells = candidates[ranked]
+            free = (~taken[ranked_cells]).nonzero()[0]
+            if len(free) > 0:
+                target = int(ranked_cells[free[0]])
+                break
+        if target is not None:
+            taken[target] = True
+            target = game_map.positions.positions[target]
+        targets.append(target)
+    return targets
+
+
+class CandidateIndex:
+    """
+    The set of cells worth targeting (cells holding more halite than the mean
+    of their four cardinal neighbors), kept in descending order of a score.
+
+    Built once with a whole-board pass and then kept current by GameMap._update,
+    which only re-evaluates the cells the engine reported as changed and their
+    neighbors, so the per-turn cost follows the number of changed cells rather
+    than the board area. Get it with GameMap.get_target_candidates.
+    """
+    def __init__(self, game_map, score=None):
+        """
+        :param game_map: The game map to index
+        :param score: Optional function from a cell index to its sort score (highest first);
+            it may only depend on the state of that cell. Defaults to the cell's halite.
+        """
+        self._game_map = game_map
+        self._score = score
+        self._indices = None  # cached indices(), cleared on refresh
+
+        halite = game_map.halite
+        candidates = (4 * halite > _neighbor_sums(game_map, np.arange(len(halite)))).nonzero()[0]
+        if score is None:
+            keys = list(zip((-halite[candidates]).tolist(), candidates.tolist()))
+        else:
+            keys = [(-score(index), index) for index in candidates.tolist()]
+        self._keys = {key[1]: key for key in keys}  # candidate cell index -> its key in _order
+        self._order = sorted(keys)                  # sorted (-score, cell index) of all candidates
+
+    def _refresh(self, changed):
+        """
+        Re-evaluates cells whose halite changed, and their neighbors.
+        :param changed: Flat indices of the changed cells
+        :return: nothing
+        """
+        if len(changed) == 0:
+            return
+        halite = self._game_map.halite
+        neighbors = self._game_map.positions.neighbor_array[changed, :4]
+        affected = np.unique(np.concatenate((changed, neighbors.ravel())))
+        is_candidate = (4 * halite[affected] > _neighbor_sums(self._game_map, affected)).tolist()
+        for index, candidate in zip(affected.tolist(), is_candidate):
+            old_key = self._keys.pop(index, None)
+            if old_key is not None:
+                del self._order[bisect.bisect_left(self._order, old_key)]
+            if candidate:
+                key = (-(self._score(index) if self._score is not None else int(halite[index])), index)
+                self._keys[index] = key
+                bisect.insort(self._order, key)
+        self._indices = None
+
+    def indices(self):
+        """
+        :return: The candidate cell indices as an array, best first
+        """
+        if self._indices is None:
+            self._indices = np.fromiter((index for _, index in self._order), dtype=np.intp, count=len(self._order))
+        return self._indices
+
+    def __iter__(self):
+        return (index for _, index in self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, index):
+        return index in self._keys
+
+
+def _neighbor_sums(game_map, indices):
+    """Returns the total halite of the four cardinal neighbors of each of the given cells"""
+    return game_map.halite[game_map.positions.neighbor_array[indices, :4]].sum(axis=1)
@@ -0,0 +1,216 @@
+import functools
+import logging
+import time
+
+import numpy as np
+
+from . import constants
+
+
+class Deadline:
+    """
+    A point in time by which some work has to be done.
+
+    Expensive planning stages take an optional deadline and, once it has
+    expired, stop early and return the best result they have so far.
+    """
+    # How many loop iterations stages may run between clock reads
+    CHECK_INTERVAL = 64
+
+    def __init__(self, budget, start=None):
+        """
+        :param budget: Seconds from start until the deadline
+        :param start: The time.perf_counter() value the budget counts from (defaults to now)
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.end = self.start + budget
+
+    def elapsed(self):
+        """
+        :return: Seconds since the start
+        """
+        return time.perf_counter() - self.start
+
+    def remaining(self):
+        """
+        :return: Seconds left until the deadline (negative once it has passed)
+        """
+        return self.end - time.perf_counter()
+
+    def expired(self, reserve=0.0):
+        """
+        :param reserve: Seconds that should still be left over
+        :return: Whether less than reserve seconds are left
+        """
+        return time.perf_counter() >= self.end - reserve
+
+    def __repr__(self):
+        return "{}(remaining={:.3f}s)".format(self.__class__.__name__, self.remaining())
+
+
+class _Phase:
+    """Context manager adding its elapsed time to one phase of the profiler's current turn"""
+    __slots__ = ('_profiler', '_column', '_start')
+
+    def __init__(self, profiler, column):
+        self._profiler = profiler
+        self._column = column
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        profiler = self._profiler
+        profiler._times[profiler._row, self._column] += time.perf_counter() - self._start
+        return False
+
+
+class _NullPhase:
+    """Context manager that does nothing (used while profiling is disabled)"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class TurnProfiler:
+    """
+    Records the wall time spent in named phases of every turn.
+
+    Times go into a preallocated (turns x phases) array, one row per turn
+    number, with columns added as phase names first appear. A phase can be
+    timed with a context manager (phase), a decorator (timed), or, for
+    straight-line turn loops, split, which charges everything since the
+    previous split (or the start of the turn) to a phase. A phase's context
+    manager is reused, so a phase must not be nested inside itself.
+
+    While disabled every method returns right away (phase returns a shared
+    no-op context manager and timed leaves functions undecorated).
+    """
+    def __init__(self, enabled=True, max_turns=None, max_phases=16):
+        """
+        :param enabled: Whether to record anything
+        :param max_turns: The last turn number to record (defaults to constants.MAX_TURNS)
+        :param max_phases: How many distinct phases can be recorded
+        """
+        self.enabled = enabled
+        self._columns = {}  # phase name -> column in _times
+        self._phases = {}   # phase name -> its reusable _Phase
+        self._times = None
+        if enabled:
+            if max_turns is None:
+                max_turns = constants.MAX_TURNS
+            self._times = np.zeros((max_turns + 1, max_phases))
+        self._row = 0
+        self._last_row = 0
+        self._split_start = 0.0
+
+    def _column(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            if len(self._columns) == self._times.shape[1]:
+                raise ValueError("too many phases (at most {})".format(self._times.shape[1]))
+            column = self._columns[name] = len(self._columns)
+        return column
+
+    def start_turn(self, turn):
+        """
+        Starts recording a turn and its split clock.
+        :param turn: The turn number (turns past max_turns share the last row)
+        """
+        if not self.enabled:
+            return
+        self._row = min(turn, len(self._times) - 1)
+        self._last_row = max(self._last_row, self._row)
+        self._split_start = time.perf_counter()
+
+    def phase(self, name):
+        """
+        :param name: The phase's name
+        :return: A context manager adding the time spent inside it to the phase
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, self._column(name))
+        return phase
+
+    def timed(self, name):
+        """
+        :param name: The phase's name
+        :return: A decorator timing every call of a function as the phase
+        """
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def split(self, name):
+        """
+        Charges the time since the previous split (or the start of the turn) to a phase.
+        :param name: The phase's name
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._times[self._row, self._column(name)] += now - self._split_start
+        self._split_start = now
+
+    def record(self, name, seconds):
+        """
+        Adds a time measured elsewhere to a phase of the current turn.
+        :param name: The phase's name
+        :param seconds: The time to add
+        """
+        if not self.enabled:
+            return
+        self._times[self._row, self._column(name)] += seconds
+
+    def summary(self):
+        """
+        :return: A dict from phase name to its (p50, p95, max) time per turn in seconds
+        """
+        if not self.enabled or not self._columns:
+            return {}
+        times = self._times[1:self._last_row + 1, :len(self._columns)]
+        p50, p95 = np.percentile(times, [50, 95], axis=0)
+        peak = times.max(axis=0)
+        return {name: (p50[column], p95[column], peak[column]) for name, column in self._columns.items()}
+
+    def log_summary(self):
+        """Logs the p50/p95/max time of every phase"""
+        for name, (p50, p95, peak) in self.summary().items():
+            logging.info("phase %s: p50=%.2fms p95=%.2fms max=%.2fms", name, p50 * 1000, p95 * 1000, peak * 1000)
+
+    def dump(self, path):
+        """
+        Writes the recorded times (in seconds, one row per turn) to a file: a
+        .npz archive (turns, phases and times arrays) if path ends with .npz,
+        CSV (a turn column, then one column per phase) otherwise.
+        :param path: Where to write
+        """
+        if not self.enabled:
+            return
+        names = list(self._columns)
+        turns = np.arange(1, self._last_row + 1)
+        times = self._times[1:self._last_row + 1, :len(names)]
+        if path.endswith('.npz'):
+            np.savez(path, turns=turns, phases=np.array(names), times=times)
+        else:
+            np.savetxt(path, np.column_stack([turns, times]), delimiter=',', fmt=['%d'] + ['%.6f'] * len(names),
+                       header=','.join(['turn'] + names), comments='')
@@ -1,28 +1,34 @@
 import heapq
 import itertools
 
+import numpy as np
+
 class PriorityQueue():
-    def __init__(self):
-        self.REMOVED = -float('inf')         # updated nodes' old triples in the queue are given this priority
-        self.pq = []                         # triples (priority, count, node)
-        self.node_priority = {}              # mapping nodes to priority
+    """Indexed d-ary min-heap keyed by node. Updating a node's priority moves
+    its entry in place (true decrease-key), so the heap only ever holds one
+    entry per live node. Ties are broken by the order in which nodes were
+    added/updated. Once a node has been popped it can't be added again."""
+    def __init__(self, arity=4):
+        self.arity = arity
+        self.pq = []                         # triples (priority, count, node) in heap order
+        self.node_index = {}                 # mapping live nodes to their index in pq
+        self.removed = set()                 # nodes that were already popped
         self.counter = itertools.count()     # tiebreaker: unique increasing ID
 
     def update(self, node, new_priority):
         """Updates an existing node in the priority queue if the existing
         priority is higher or adds a new node. Returns whether the priority
         queue was updated."""
-        old_priority = self.node_priority.get(node)
-        # import logging
-        # logging.info("{}".format(self.node_priority))
-        if old_priority is None or new_priority < old_priority:
-            self.node_priority[node] = new_priority
-
-            # logging.info("updated {}".format(node))
-
-            id = next(self.counter)
-            heapq.heappush(self.pq, (new_priority, id, node))
-            # logging.info("{}".format(self.pq))
+        index = self.node_index.get(node)
+        if index is None:
+            if node in self.removed:
+                return False
+            self.pq.append((new_priority, next(self.counter), node))
+            self._sift_up(len(self.pq) - 1)
+            return True
+        if new_priority < self.pq[index][0]:
+            self.pq[index] = (new_priority, next(self.counter), node)
+            self._sift_up(index)
             return True
         return False
 
@@ -30,26 +36,220 @@ class PriorityQueue():
         """Removes the node with minimum priority (ties broken by order in which
         the nodes were added/updated). Returns the node and its priority and
         returns None, None if the priority queue is empty."""
-        while len(self.pq) > 0:
-            priority, _id, node = heapq.heappop(self.pq)
-            if self.node_priority[node] == self.REMOVED: continue # Node was previously removed, skip this one
-            self.node_priority[node] = self.REMOVED
-            return node, priority
-        return None, None
+        if len(self.pq) == 0:
+            return None, None
+        priority, _id, node = self.pq[0]
+        last = self.pq.pop()
+        del self.node_index[node]
+        self.removed.add(node)
+        if len(self.pq) > 0:
+            self.pq[0] = last
+            self.node_index[last[2]] = 0
+            self._sift_down(0)
+        return node, priority
 
     def nsmallest(self, n):
-        # returns list of N (node, priority) tuples sorted in ascending order of priority
+        # returns list of N (node, priority) tuples sorted in ascending order of priority,
+        # without removing them, in O(n log n) by walking the heap from the root
         smallest = []
-        i = 0
-        while i < len(self.pq) and len(smallest) < n:
-            priority, _id, node = self.pq[i]
-            if self.node_priority[node] != self.REMOVED:
-                smallest.append((node, priority))
-            i += 1
+        frontier = [(self.pq[0], 0)] if len(self.pq) > 0 else []
+        while len(frontier) > 0 and len(smallest) < n:
+            (priority, _id, node), index = heapq.heappop(frontier)
+            smallest.append((node, priority))
+            first_child = index * self.arity + 1
+            for child in range(first_child, min(first_child + self.arity, len(self.pq))):
+                heapq.heappush(frontier, (self.pq[child], child))
         return smallest
 
+    def _sift_up(self, index):
+        entry = self.pq[index]
+        while index > 0:
+            parent = (index - 1) // self.arity
+            if self.pq[parent] <= entry:
+                break
+            self.pq[index] = self.pq[parent]
+            self.node_index[self.pq[index][2]] = index
+            index = parent
+        self.pq[index] = entry
+        self.node_index[entry[2]] = index
+
+    def _sift_down(self, index):
+        entry = self.pq[index]
+        size = len(self.pq)
+        while True:
+            first_child = index * self.arity + 1
+            if first_child >= size:
+                break
+            smallest = min(range(first_child, min(first_child + self.arity, size)), key=self.pq.__getitem__)
+            if entry <= self.pq[smallest]:
+                break
+            self.pq[index] = self.pq[smallest]
+            self.node_index[self.pq[index][2]] = index
+            index = smallest
+        self.pq[index] = entry
+        self.node_index[entry[2]] = index
+
     def empty(self):
         return len(self.pq) == 0
 
     def __len__(self):
         return len(self.pq)
+
+
+class BucketPriorityQueue():
+    """Same interface as PriorityQueue for integer priorities, backed by one
+    bucket per priority value. Updates move a node between buckets in O(1) and
+    pop_min scans upward from the lowest non-empty bucket, which is cheap when
+    the priorities span a small range (e.g. halite amounts or move costs)."""
+    def __init__(self):
+        self.buckets = {}                    # priority -> {node: None}, in the order nodes were added/updated
+        self.node_priority = {}              # mapping live nodes to priority
+        self.removed = set()                 # nodes that were already popped
+        self.min_priority = None             # no bucket below this priority is non-empty
+
+    def update(self, node, new_priority):
+        """Updates an existing node in the priority queue if the existing
+        priority is higher or adds a new node. Returns whether the priority
+        queue was updated."""
+        old_priority = self.node_priority.get(node)
+        if old_priority is None:
+            if node in self.removed:
+                return False
+        elif new_priority < old_priority:
+            self._discard(node, old_priority)
+        else:
+            return False
+        self.node_priority[node] = new_priority
+        self.buckets.setdefault(new_priority, {})[node] = None
+        if self.min_priority is None or new_priority < self.min_priority:
+            self.min_priority = new_priority
+        return True
+
+    def pop_min(self):
+        """Removes the node with minimum priority (ties broken by order in which
+        the nodes were added/updated). Returns the node and its priority and
+        returns None, None if the priority queue is empty."""
+        if len(self.node_priority) == 0:
+            return None, None
+        while self.min_priority not in self.buckets:
+            self.min_priority += 1
+        priority = self.min_priority
+        node = next(iter(self.buckets[priority]))
+        self._discard(node, priority)
+        del self.node_priority[node]
+        self.removed.add(node)
+        return node, priority
+
+    def nsmallest(self, n):
+        # returns list of N (node, priority) tuples sorted in ascending order of priority
+        smallest = []
+        for priority in sorted(self.buckets):
+            for node in self.buckets[priority]:
+                if len(smallest) >= n:
+                    return smallest
+                smallest.append((node, priority))
+        return smallest
+
+    def _discard(self, node, priority):
+        bucket = self.buckets[priority]
+        del bucket[node]
+        if len(bucket) == 0:
+            del self.buckets[priority]
+
+    def empty(self):
+        return len(self.node_priority) == 0
+
+    def __len__(self):
+        return len(self.node_priority)
+
+
+def diamond_sum(grids, radius):
+    """Sums every cell's Manhattan-radius neighborhood on a toroidal grid.
+    grids can be a single (height, width) array or a stack of them (the last
+    two axes are the map). Returns an array of the same shape where each entry
+    is the sum of the input over all cells at most radius away (wrapping)."""
+    # column[k]: sum over the vertical window of half-height k around each cell
+    column = grids.copy()
+    columns = [column]
+    for k in range(1, radius + 1):
+        column = column + np.roll(grids, k, axis=-2) + np.roll(grids, -k, axis=-2)
+        columns.append(column)
+    total = columns[radius].copy()
+    for dx in range(1, radius + 1):
+        total += np.roll(columns[radius - dx], dx, axis=-1) + np.roll(columns[radius - dx], -dx, axis=-1)
+    return total
+
+
+class DiamondSums():
+    """Constant-time sums over the Manhattan-radius diamonds of a toroidal grid.
+    Rotating the grid by 45 degrees (u = x + y, v = x - y) turns every diamond
+    into an axis-aligned square, so after one 2D prefix sum over the rotated
+    (wrap-padded) grid any diamond sum takes four lookups. mask optionally
+    selects the cells that count (e.g. unoccupied ones); count and mean only
+    consider those. Radii go up to max_radius, which should stay below half the
+    map size (larger diamonds overlap themselves on the torus)."""
+    _layouts = {}  # (height, width, max_radius) -> index arrays shared by every grid of that shape
+
+    def __init__(self, grid, max_radius=None, mask=None):
+        self.height, self.width = grid.shape
+        if max_radius is None:
+            max_radius = (min(self.height, self.width) - 1) // 2
+        self.max_radius = max_radius
+        self._side, self._source, self._target, self._u, self._v = self._layout(self.height, self.width, max_radius)
+        self._mask = np.ones(grid.shape, dtype=np.int64) if mask is None else mask
+        self._totals = self._prefix(grid if mask is None else np.where(mask, grid, 0))
+        self._counts = None  # built on first use
+
+    def _get_counts(self):
+        if self._counts is None:
+            self._counts = self._prefix(self._mask)
+        return self._counts
+
+    @classmethod
+    def _layout(cls, height, width, max_radius):
+        """Where each cell of the wrap-padded grid lands in the rotated grid, and the rotated coordinates of the cells"""
+        key = (height, width, max_radius)
+        layout = cls._layouts.get(key)
+        if layout is None:
+            padded_height, padded_width = height + 2 * max_radius, width + 2 * max_radius
+            side = padded_height + padded_width
+            ys, xs = np.indices((padded_height, padded_width))
+            u, v = xs + ys, xs - ys + padded_height - 1
+            source = ((ys - max_radius) % height) * width + (xs - max_radius) % width
+            cells = (slice(max_radius, max_radius + height), slice(max_radius, max_radius + width))
+            layout = cls._layouts[key] = (side, source.reshape(-1), (u * side + v).reshape(-1),
+                                          u[cells].reshape(-1), v[cells].reshape(-1))
+        return layout
+
+    def _prefix(self, grid):
+        """2D prefix sums of the wrap-padded grid rotated by 45 degrees (with a leading row and column of zeros)"""
+        rotated = np.zeros(self._side * self._side, dtype=np.int64)
+        rotated[self._target] = grid.reshape(-1)[self._source]
+        prefix = np.zeros((self._side + 1, self._side + 1), dtype=np.int64)
+        np.cumsum(rotated.reshape(self._side, self._side), axis=0, out=prefix[1:, 1:])
+        np.cumsum(prefix[1:, 1:], axis=1, out=prefix[1:, 1:])
+        return prefix
+
+    def _query(self, prefix, u, v, radius):
+        if not 0 <= radius <= self.max_radius:
+            raise ValueError("radius {} outside of [0, {}]".format(radius, self.max_radius))
+        return (prefix[u + radius + 1, v + radius + 1] - prefix[u - radius, v + radius + 1]
+                - prefix[u + radius + 1, v - radius] + prefix[u - radius, v - radius])
+
+    def total(self, index, radius):
+        """Returns the sum over the cells within radius of a cell (by flat index y * width + x)"""
+        return int(self._query(self._totals, self._u[index], self._v[index], radius))
+
+    def count(self, index, radius):
+        """Returns how many cells within radius of a cell count (all of them without a mask)"""
+        return int(self._query(self._get_counts(), self._u[index], self._v[index], radius))
+
+    def mean(self, index, radius):
+        """Returns the mean over the counted cells within radius of a cell (0 if there are none)"""
+        count = self.count(index, radius)
+        return self.total(index, radius) / count if count else 0.0
+
+    def grid(self, radius, counts=False):
+        """Returns the radius sums (or counts) of every cell at once as a (height, width) array"""
+        prefix = self._get_counts() if counts else self._totals
+        return self._query(prefix, self._u, self._v, radius).reshape(self.height, self.width)
@@ -1,92 +1,310 @@
 ## Adapted from: https://github.com/HaliteChallenge/Halite-III/blob/master/starter_kits/ml/SVM/parse.py
-import copy
+import collections.abc
+import concurrent.futures
 import json
 import os
 import os.path
+import tempfile
+import traceback
 import zstd
 
+import numpy as np
+
 import hlt
 
 ARBITRARY_ID = -1
 
 
-def parse_replay_file(file_name, player_name):
-    print("Load Replay: " + file_name)
+class ReplayFrames(collections.abc.Sequence):
+    """
+    The halite on the board at every turn of a replay, stored compactly.
+
+    Only the initial board, the cells each turn changes and a full copy of the
+    board every keyframe_interval turns are kept. Indexing builds that turn's
+    GameMap on demand, starting from the closest earlier keyframe (or from the
+    last turn built, when scrubbing forward) and applying the changes since.
+    Use halite(turn) to get just the board's halite as a flat array.
+    """
+    def __init__(self, first_halite, width, height, cell_offsets, changed_cells, changed_halite,
+                 keyframe_interval=32):
+        """
+        :param first_halite: The initial halite of every cell, as a flat array indexed by y * width + x
+        :param width: The board's width
+        :param height: The board's height
+        :param cell_offsets: Turn t changed the cells in [cell_offsets[t], cell_offsets[t + 1]) of the next two
+        :param changed_cells: Flat indices of the changed cells, turn by turn
+        :param changed_halite: The changed cells' new halite
+        :param keyframe_interval: How many turns apart full copies of the board are kept
+        """
+        self.width = width
+        self.height = height
+        self.keyframe_interval = keyframe_interval
+        self._offsets = cell_offsets
+        self._changed_cells = changed_cells
+        self._changed_halite = changed_halite
+
+        keyframes = []
+        halite = np.array(first_halite, dtype=np.int32)
+        for turn in range(len(self)):
+            self._apply(halite, turn, turn + 1)
+            if turn % keyframe_interval == 0:
+                keyframes.append(halite.copy())
+        self._keyframes = np.array(keyframes, dtype=np.int32).reshape(-1, width * height)
+        self._last_turn = None  # the turn last built, and its halite, to scrub forward from
+        self._last_halite = None
+
+    def _apply(self, halite, start, stop):
+        """Applies turns [start, stop)'s changes to a flat halite array, in turn order"""
+        offsets = self._offsets
+        for turn in range(start, stop):
+            changes = slice(offsets[turn], offsets[turn + 1])
+            halite[self._changed_cells[changes]] = self._changed_halite[changes]
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def halite(self, turn):
+        """
+        :param turn: The turn (index into the frames; negative counts from the end)
+        :return: A new flat array of every cell's halite at that turn
+        """
+        if turn < 0:
+            turn += len(self)
+        if not 0 <= turn < len(self):
+            raise IndexError("turn {} out of range for {} frames".format(turn, len(self)))
+        keyframe = turn // self.keyframe_interval
+        start = keyframe * self.keyframe_interval
+        if self._last_turn is not None and start <= self._last_turn <= turn:
+            halite = self._last_halite.copy()
+            start = self._last_turn
+        else:
+            halite = self._keyframes[keyframe].copy()
+        self._apply(halite, start + 1, turn + 1)
+        self._last_turn, self._last_halite = turn, halite.copy()
+        return halite
+
+    def __getitem__(self, turn):
+        if isinstance(turn, slice):
+            return [self[t] for t in range(*turn.indices(len(self)))]
+        return hlt.game_map.GameMap(self.halite(turn), self.width, self.height)
+
+
+class Replay(collections.abc.Sequence):
+    """
+    The turns of a replay from one player's point of view, kept as the flat
+    arrays of replay_arrays. Indexing returns a
+    (game_map, moves, my_ships, their_ships, my_dropoffs, their_dropoffs)
+    tuple, built on demand (see ReplayFrames for the GameMap).
+    """
+    def __init__(self, arrays, keyframe_interval=32):
+        """
+        :param arrays: The replay as returned by replay_arrays
+        :param keyframe_interval: See ReplayFrames
+        """
+        self.arrays = arrays
+        self.player_id = int(arrays['player_id'])
+        self.frames = ReplayFrames(arrays['first_halite'], int(arrays['width']), int(arrays['height']),
+                                   arrays['cell_offsets'], arrays['changed_cells'], arrays['changed_halite'],
+                                   keyframe_interval)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _rows(self, name, turn):
+        """The rows of a per-turn table (see replay_arrays) for one turn"""
+        offsets = self.arrays[name + '_offsets']
+        return slice(offsets[turn], offsets[turn + 1])
+
+    def moves(self, turn):
+        """
+        :return: A dict from ship IDs to command letters (e.g. 'n') of the player's moves that turn
+        """
+        rows = self._rows('move', turn)
+        return dict(zip(self.arrays['move_ship'][rows].tolist(), self.arrays['move_direction'][rows].tolist()))
+
+    def ships(self, turn):
+        """
+        :return: A (my_ships, their_ships) pair of dicts from ship IDs to the Ships on the board that turn
+        """
+        rows = self._rows('ship', turn)
+        my_ships = {}
+        their_ships = {}
+        for owner, ship_id, x, y, halite in zip(*(self.arrays[column][rows].tolist() for column in
+                                                 ('ship_owner', 'ship_id', 'ship_x', 'ship_y', 'ship_halite'))):
+            ships = my_ships if owner == self.player_id else their_ships
+            ships[ship_id] = hlt.entity.Ship(owner, ship_id, hlt.positionals.Position(x, y), halite)
+        return my_ships, their_ships
+
+    def dropoffs(self, turn):
+        """
+        :return: A (my_dropoffs, their_dropoffs) pair of tuples of the Shipyards and Dropoffs standing
+            that turn, shipyards first
+        """
+        my_dropoffs = []
+        their_dropoffs = []
+        arrays = self.arrays
+        structures = [(hlt.entity.Shipyard, owner, x, y) for owner, x, y in zip(
+            arrays['shipyard_owner'].tolist(), arrays['shipyard_x'].tolist(), arrays['shipyard_y'].tolist())]
+        built = arrays['dropoff_turn'] <= turn
+        structures += [(hlt.entity.Dropoff, owner, x, y) for owner, x, y in zip(
+            arrays['dropoff_owner'][built].tolist(), arrays['dropoff_x'][built].tolist(),
+            arrays['dropoff_y'][built].tolist())]
+        for entity_type, owner, x, y in structures:
+            dropoffs = my_dropoffs if owner == self.player_id else their_dropoffs
+            dropoffs.append(entity_type(owner, ARBITRARY_ID, hlt.positionals.Position(x, y)))
+        return tuple(my_dropoffs), tuple(their_dropoffs)
+
+    def __getitem__(self, turn):
+        if isinstance(turn, slice):
+            return [self[t] for t in range(*turn.indices(len(self)))]
+        game_map = self.frames[turn]
+        if turn < 0:
+            turn += len(self)
+        return (game_map, self.moves(turn)) + self.ships(turn) + self.dropoffs(turn)
+
+
+def replay_arrays(file_name, player_name):
+    """
+    Reads a replay into flat arrays (no Python objects per ship or cell), which
+    is what Replay wraps and what parse_replay_folder's workers hand back:
+        width, height, player_id: the board's size and the player's id
+        constants, statistics: the game constants and the game statistics, as JSON strings
+        first_halite: the initial halite of every cell (indexed by y * width + x)
+        cell_offsets, changed_cells, changed_halite: per turn, the cells it changed and their new halite
+        ship_offsets, ship_owner, ship_id, ship_x, ship_y, ship_halite: per turn, every ship on the board
+        move_offsets, move_ship, move_direction: per turn, the player's move commands
+        shipyard_owner, shipyard_x, shipyard_y: every player's shipyard
+        dropoff_turn, dropoff_owner, dropoff_x, dropoff_y: every dropoff built, and the turn it was built
+    Rows of a turn t are [offsets[t], offsets[t + 1]) of the matching offsets array.
+    :param file_name: The .hlt replay file
+    :param player_name: The player's name, without version (the part before the first space)
+    :return: A dict from the names above to numpy arrays
+    """
     with open(file_name, 'rb') as f:
         data = json.loads(zstd.loads(f.read()))
 
-    hlt.constants.load_constants(data['GAME_CONSTANTS'])
     width = data['production_map']['width']
     height = data['production_map']['height']
-    hlt.constants.set_dimensions(width, height)
-
-    print("Load Basic Information")
     player = [p for p in data['players'] if p['name'].split(" ")[0] == player_name][0]
     player_id = int(player['player_id'])
-    my_shipyard = hlt.entity.Shipyard(player_id, ARBITRARY_ID,
-                               hlt.positionals.Position(player['factory_location']['x'], player['factory_location']['y']))
-    other_shipyards = [
-        hlt.entity.Shipyard(p['player_id'], ARBITRARY_ID, hlt.positionals.Position(p['factory_location']['x'], p['factory_location']['y']))
-        for p in data['players'] if int(p['player_id']) != player_id]
-
-    print("Load Cell Information")
-    first_cells = []
-    for x in range(len(data['production_map']['grid'])):
-        row = []
-        for y in range(len(data['production_map']['grid'][x])):
-            row += [hlt.game_map.MapCell(hlt.positionals.Position(x, y), data['production_map']['grid'][x][y]['energy'])]
-        first_cells.append(row)
-    frames = []
-    for f in data['full_frames']:
-        prev_cells = first_cells if len(frames) == 0 else frames[-1]._cells
-        new_cells = copy.deepcopy(prev_cells)
-        for c in f['cells']:
-            new_cells[c['y']][c['x']].halite_amount = c['production']
-        frames.append(hlt.game_map.GameMap(new_cells, width, height))
-
-    print("Load Player Ships")
-    moves = [{} if str(player_id) not in f['moves'] else {m['id']: m['direction'] for m in f['moves'][str(player_id)] if
-                                                          m['type'] == "m"} for f in data['full_frames']]
-    ships = [{} if str(player_id) not in f['entities'] else {
-        int(sid): hlt.entity.Ship(player_id, int(sid), hlt.positionals.Position(ship['x'], ship['y']), ship['energy']) for sid, ship in
-        f['entities'][str(player_id)].items()} for f in data['full_frames']]
-
-    print("Load Other Player Ships")
-    other_ships = [
-        {int(sid): hlt.entity.Ship(int(pid), int(sid), hlt.positionals.Position(ship['x'], ship['y']), ship['energy']) for pid, p in
-         f['entities'].items() if
-         int(pid) != player_id for sid, ship in p.items()} for f in data['full_frames']]
-
-    print("Load Droppoff Information")
-    first_my_dropoffs = [my_shipyard]
-    first_them_dropoffs = other_shipyards
-    my_dropoffs = []
-    them_dropoffs = []
-    for f in data['full_frames']:
-        new_my_dropoffs = copy.deepcopy(first_my_dropoffs if len(my_dropoffs) == 0 else my_dropoffs[-1])
-        new_them_dropoffs = copy.deepcopy(first_them_dropoffs if len(them_dropoffs) == 0 else them_dropoffs[-1])
-        for e in f['events']:
-            if e['type'] == 'construct':
-                if int(e['owner_id']) == player_id:
-                    new_my_dropoffs.append(
-                        hlt.entity.Dropoff(player_id, ARBITRARY_ID, hlt.positionals.Position(e['location']['x'], e['location']['y'])))
-                else:
-                    new_them_dropoffs.append(
-                        hlt.entity.Dropoff(e['owner_id'], ARBITRARY_ID, hlt.positionals.Position(e['location']['x'], e['location']['y'])))
-        my_dropoffs.append(new_my_dropoffs)
-        them_dropoffs.append(new_them_dropoffs)
-
-    statistics = data['game_statistics']
-    return list(zip(frames, moves, ships, other_ships, my_dropoffs, them_dropoffs)), statistics
-
-
-def parse_replay_folder(folder_name, player_name, max_files=None):
-    replay_buffer = []
-    for file_name in sorted(os.listdir(folder_name)):
-        if not file_name.endswith(".hlt"):
-            continue
-        elif max_files is not None and len(replay_buffer) >= max_files:
-            break
-        else:
-            replay_buffer.append(parse_replay_file(os.path.join(folder_name, file_name), player_name))
-    return replay_buffer
+    frames = data['full_frames']
+
+    def offsets(rows_per_turn):
+        turn_offsets = np.zeros(len(frames) + 1, dtype=np.intp)
+        np.cumsum(rows_per_turn, out=turn_offsets[1:])
+        return turn_offsets
+
+    def columns(rows, names):
+        table = np.array(rows, dtype=np.int32).reshape(-1, len(names))
+        return {name: table[:, i].copy() for i, name in enumerate(names)}
+
+    arrays = {
+        'width': np.array(width), 'height': np.array(height), 'player_id': np.array(player_id),
+        'constants': np.array(json.dumps(data['GAME_CONSTANTS'])),
+        'statistics': np.array(json.dumps(data['game_statistics'])),
+        'first_halite': np.array([cell['energy'] for row in data['production_map']['grid'] for cell in row],
+                                 dtype=np.int32),
+        'cell_offsets': offsets([len(f['cells']) for f in frames]),
+        'ship_offsets': offsets([sum(len(ships) for ships in f['entities'].values()) for f in frames]),
+    }
+    arrays.update(columns([(c['y'] * width + c['x'], c['production']) for f in frames for c in f['cells']],
+                          ('changed_cells', 'changed_halite')))
+    arrays.update(columns([(int(pid), int(sid), ship['x'], ship['y'], ship['energy'])
+                           for f in frames for pid, ships in f['entities'].items() for sid, ship in ships.items()],
+                          ('ship_owner', 'ship_id', 'ship_x', 'ship_y', 'ship_halite')))
+
+    moves = [[] if str(player_id) not in f['moves'] else
+             [(m['id'], m['direction']) for m in f['moves'][str(player_id)] if m['type'] == "m"] for f in frames]
+    arrays['move_offsets'] = offsets([len(turn_moves) for turn_moves in moves])
+    arrays['move_ship'] = np.array([ship_id for turn_moves in moves for ship_id, _ in turn_moves], dtype=np.int32)
+    arrays['move_direction'] = np.array([direction for turn_moves in moves for _, direction in turn_moves],
+                                        dtype='U1')
+
+    arrays.update(columns([(p['player_id'], p['factory_location']['x'], p['factory_location']['y'])
+                           for p in data['players']], ('shipyard_owner', 'shipyard_x', 'shipyard_y')))
+    arrays.update(columns([(turn, e['owner_id'], e['location']['x'], e['location']['y'])
+                           for turn, f in enumerate(frames) for e in f['events'] if e['type'] == 'construct'],
+                          ('dropoff_turn', 'dropoff_owner', 'dropoff_x', 'dropoff_y')))
+    return arrays
+
+
+def load_replay(arrays, keyframe_interval=32):
+    """
+    Wraps a replay's arrays (see replay_arrays) in a Replay, loading its game constants.
+    :return: The Replay and the game statistics
+    """
+    hlt.constants.load_constants(json.loads(str(arrays['constants'])))
+    hlt.constants.set_dimensions(int(arrays['width']), int(arrays['height']))
+    return Replay(arrays, keyframe_interval), json.loads(str(arrays['statistics']))
+
+
+def parse_replay_file(file_name, player_name, keyframe_interval=32):
+    print("Load Replay: " + file_name)
+    return load_replay(replay_arrays(file_name, player_name), keyframe_interval)
+
+
+def _parse_to_file(file_name, player_name, out_name):
+    """
+    Worker for parse_replay_folder: saves a replay's arrays to out_name.
+    :return: None, or the formatted exception if the replay couldn't be parsed
+    """
+    try:
+        np.savez(out_name, **replay_arrays(file_name, player_name))
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def parse_replay_folder(folder_name, player_name, max_files=None, workers=1):
+    """
+    Parses the .hlt replays in a folder, in name order. Replays that fail to
+    parse are reported and skipped.
+    :param folder_name: The folder holding the replays
+    :param player_name: See replay_arrays
+    :param max_files: If given, only the first max_files replays are parsed
+    :param workers: How many processes parse replays at once (None for one per CPU). With more
+        than one, each worker saves its replay's arrays to a temporary file, which is all the
+        main process reads back.
+    :return: A list of (Replay, statistics) pairs, as returned by parse_replay_file
+    """
+    file_names = [os.path.join(folder_name, file_name) for file_name in sorted(os.listdir(folder_name))
+                  if file_name.endswith(".hlt")][:max_files]
+    if workers is None:
+        workers = os.cpu_count()
+
+    replay_buffer = [None] * len(file_names)
+    done = failed = 0
+
+    def report(i, error):
+        nonlocal done, failed
+        done += 1
+        if error is not None:
+            failed += 1
+            print("Failed to parse {}:\n{}".format(file_names[i], error))
+        print("Parsed {}/{} replays ({} failed)".format(done, len(file_names), failed))
+
+    if workers <= 1:
+        for i, file_name in enumerate(file_names):
+            error = None
+            try:
+                replay_buffer[i] = parse_replay_file(file_name, player_name)
+            except Exception:
+                error = traceback.format_exc()
+            report(i, error)
+    else:
+        with tempfile.TemporaryDirectory() as out_dir, \
+                concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            out_names = [os.path.join(out_dir, "{}.npz".format(i)) for i in range(len(file_names))]
+            pending = {pool.submit(_parse_to_file, file_name, player_name, out_name): i
+                       for i, (file_name, out_name) in enumerate(zip(file_names, out_names))}
+            for future in concurrent.futures.as_completed(pending):
+                i = pending[future]
+                try:
+                    error = future.result()
+                    if error is None:
+                        with np.load(out_names[i]) as arrays:
+                            replay_buffer[i] = load_replay(dict(arrays))
+                except Exception:
+                    error = traceback.format_exc()
+                report(i, error)
+    return [replay for replay in replay_buffer if replay is not None]
@@ -9,10 +9,10 @@ def main():
 
     for turn_number in range(len(replay_info)):
         game_map, moves, my_ships, their_ships, my_dropoffs, their_dropoffs = replay_info[turn_number]
-        # game_map: a GameMap obj
+        # game_map: a GameMap obj, built on demand (replay_info.frames.halite(turn_number) is just its halite)
         # moves: dict from my ship IDs to command letters e.g. 'n'
         # my_ships/other_ships: dicts from ship IDs to Ship objects
-        # my_dropoffs/their_dropoffs: lists of Shipyard/Dropoff objects
+        # my_dropoffs/their_dropoffs: tuples of Shipyard/Dropoff objects
         pass
 
 